@@ -6,168 +6,208 @@ This script adds neighbor relationships to map JSON files by detecting
 when province boundaries share edges.
 """
 
+import argparse
+import hashlib
 import json
 import math
+import os
+import sys
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
+
+# Map files are parsed and encoded with orjson when it is installed
+sys.path.insert(0, str(Path(__file__).parent))
+from generate_europe_maps import encode_json, parse_json, replace_file
+
+# Maps with at least this many provinces use the edge spatial index instead of
+# comparing every province pair edge-by-edge.
+SPATIAL_INDEX_MIN_PROVINCES = 30
+
+# Maps below SPATIAL_INDEX_MIN_PROVINCES are measured pair by pair, and their
+# cost follows boundary sizes more than the pair count: about 4 ns per pair of
+# vertices, against 15-35 ms to start a worker pool. Candidate pairs whose
+# boundary sizes multiply out to fewer vertex pairs than this are measured
+# in-process; every real country map is far below it.
+PARALLEL_MIN_VERTEX_PAIRS = 20000000
+PARALLEL_CHUNK_SIZE = 256
+
+# Consecutive boundary edges grouped under one bounding box when measuring a
+# border, so runs of edges far from the other province are skipped together.
+EDGE_TILE_SIZE = 16
+
+def boundary_coords(boundary: List) -> Tuple[List[float], List[float]]:
+    """Split a boundary ({"x", "y"} points or [x, y] pairs) into x and y lists."""
+    if boundary and not isinstance(boundary[0], dict):
+        return [p[0] for p in boundary], [p[1] for p in boundary]
+    return [p['x'] for p in boundary], [p['y'] for p in boundary]
+
+def coords_to_edges(xs: List[float], ys: List[float], tolerance: float) -> List[Tuple[float, ...]]:
+    """
+    Precompute the geometry of every edge in a boundary ring.
+    Each edge is (x1, y1, x2, y2, min_x, max_x, min_y, max_y, length, nx, ny)
+    where the bounding box is expanded by tolerance and (nx, ny) is the unit
+    direction (zero for degenerate edges).
+    """
+    edges = []
+
+    # Pair every vertex with its successor (wrapping to close the ring)
+    for x1, y1, x2, y2 in zip(xs, ys, xs[1:] + xs[:1], ys[1:] + ys[:1]):
+        dx = x2 - x1
+        dy = y2 - y1
+        length = math.sqrt(dx * dx + dy * dy)
+
+        if length > 0:
+            nx = dx / length
+            ny = dy / length
+        else:
+            nx = ny = 0.0
+
+        edges.append((
+            x1, y1, x2, y2,
+            min(x1, x2) - tolerance, max(x1, x2) + tolerance,
+            min(y1, y2) - tolerance, max(y1, y2) + tolerance,
+            length, nx, ny
+        ))
+
+    return edges
+
+def map_coords(provinces: List[Dict]) -> List[Tuple[List[float], List[float]]]:
+    """Split every province boundary into x and y coordinate lists."""
+    return [boundary_coords(province.get('boundary', [])) for province in provinces]
+
+def pack_coords(province_coords: List[Tuple[List[float], List[float]]]) -> Tuple[array, array, List[int]]:
+    """
+    Concatenate every province's coordinates into two flat float64 arrays.
+    Province i spans offsets[i]:offsets[i + 1]; the arrays pickle as raw
+    bytes, far smaller than the per-province lists or edge tuples.
+    """
+    xs = array('d')
+    ys = array('d')
+    offsets = [0]
+
+    for province_xs, province_ys in province_coords:
+        xs.extend(province_xs)
+        ys.extend(province_ys)
+        offsets.append(len(xs))
 
-def distance(p1: Dict[str, float], p2: Dict[str, float]) -> float:
-    """Calculate Euclidean distance between two points."""
-    dx = p1['x'] - p2['x']
-    dy = p1['y'] - p2['y']
-    return math.sqrt(dx * dx + dy * dy)
+    return xs, ys, offsets
 
-def points_close(p1: Dict[str, float], p2: Dict[str, float], tolerance: float) -> bool:
-    """Check if two points are within tolerance distance."""
-    return distance(p1, p2) < tolerance
+def unpack_coords(xs: array, ys: array, offsets: List[int]) -> List[Tuple[List[float], List[float]]]:
+    """Split packed coordinate arrays (see pack_coords) back into per-province lists."""
+    return [(xs[start:end].tolist(), ys[start:end].tolist())
+            for start, end in zip(offsets, offsets[1:])]
 
-def segments_intersect(a1: Dict, a2: Dict, b1: Dict, b2: Dict, tolerance: float) -> Tuple[bool, float]:
+def edge_overlap_length(edge_a: Tuple[float, ...], edge_b: Tuple[float, ...], tolerance: float) -> float:
     """
-    Check if two line segments intersect or share an edge.
-    Returns (intersects: bool, shared_length: float)
+    Length of the collinear overlap between two precomputed edges, measured
+    along edge_a: the edges must be nearly parallel, both longer than
+    tolerance, and edge_b's endpoints within tolerance of edge_a's line.
+    Returns 0.0 when the edges do not share a border segment.
     """
-    # Check if segments are collinear (share an edge)
-    # This is the key for detecting shared borders
+    a1x, a1y, _, _, a_min_x, a_max_x, a_min_y, a_max_y, len_a, nx_a, ny_a = edge_a
+    b1x, b1y, b2x, b2y, b_min_x, b_max_x, b_min_y, b_max_y, len_b, nx_b, ny_b = edge_b
 
-    # Quick bounding box check first
-    a_min_x = min(a1['x'], a2['x']) - tolerance
-    a_max_x = max(a1['x'], a2['x']) + tolerance
-    a_min_y = min(a1['y'], a2['y']) - tolerance
-    a_max_y = max(a1['y'], a2['y']) + tolerance
-
-    b_min_x = min(b1['x'], b2['x']) - tolerance
-    b_max_x = max(b1['x'], b2['x']) + tolerance
-    b_min_y = min(b1['y'], b2['y']) - tolerance
-    b_max_y = max(b1['y'], b2['y']) + tolerance
-
-    # No intersection if bounding boxes don't overlap
     if (a_max_x < b_min_x or b_max_x < a_min_x or
         a_max_y < b_min_y or b_max_y < a_min_y):
-        return False, 0.0
-
-    # Check if endpoints are close (shared vertices)
-    endpoints_close = (
-        points_close(a1, b1, tolerance) or
-        points_close(a1, b2, tolerance) or
-        points_close(a2, b1, tolerance) or
-        points_close(a2, b2, tolerance)
-    )
-
-    # Calculate vectors
-    dx_a = a2['x'] - a1['x']
-    dy_a = a2['y'] - a1['y']
-    dx_b = b2['x'] - b1['x']
-    dy_b = b2['y'] - b1['y']
-
-    len_a = math.sqrt(dx_a * dx_a + dy_a * dy_a)
-    len_b = math.sqrt(dx_b * dx_b + dy_b * dy_b)
+        return 0.0
 
     if len_a < tolerance or len_b < tolerance:
-        return endpoints_close, 0.0
-
-    # Normalize vectors
-    nx_a = dx_a / len_a
-    ny_a = dy_a / len_a
-    nx_b = dx_b / len_b
-    ny_b = dy_b / len_b
+        return 0.0
 
-    # Check if vectors are parallel (collinear segments)
-    cross = abs(nx_a * ny_b - ny_a * nx_b)
+    # Only nearly parallel edges can share a border
+    if abs(nx_a * ny_b - ny_a * nx_b) >= 0.01:
+        return 0.0
 
-    if cross < 0.01:  # Nearly parallel
-        # Check if segments overlap
-        # Project all points onto the line direction
-        # Using segment A's direction as reference
+    dx1 = b1x - a1x
+    dy1 = b1y - a1y
+    dx2 = b2x - a1x
+    dy2 = b2y - a1y
 
-        proj_a1 = 0.0
-        proj_a2 = len_a
-        proj_b1 = (b1['x'] - a1['x']) * nx_a + (b1['y'] - a1['y']) * ny_a
-        proj_b2 = (b2['x'] - a1['x']) * nx_a + (b2['y'] - a1['y']) * ny_a
+    perp_dist_b1 = abs(dx1 * (-ny_a) + dy1 * nx_a)
+    perp_dist_b2 = abs(dx2 * (-ny_a) + dy2 * nx_a)
 
-        # Check if points are close to the line
-        perp_dist_b1 = abs((b1['x'] - a1['x']) * (-ny_a) + (b1['y'] - a1['y']) * nx_a)
-        perp_dist_b2 = abs((b2['x'] - a1['x']) * (-ny_a) + (b2['y'] - a1['y']) * nx_a)
+    if perp_dist_b1 >= tolerance or perp_dist_b2 >= tolerance:
+        return 0.0
 
-        if perp_dist_b1 < tolerance and perp_dist_b2 < tolerance:
-            # Segments are collinear, check overlap
-            overlap_start = max(proj_a1, min(proj_b1, proj_b2))
-            overlap_end = min(proj_a2, max(proj_b1, proj_b2))
-            overlap_length = max(0.0, overlap_end - overlap_start)
+    proj_b1 = dx1 * nx_a + dy1 * ny_a
+    proj_b2 = dx2 * nx_a + dy2 * ny_a
 
-            if overlap_length > tolerance:
-                return True, overlap_length
+    overlap_start = max(0.0, min(proj_b1, proj_b2))
+    overlap_end = min(len_a, max(proj_b1, proj_b2))
+    overlap_length = max(0.0, overlap_end - overlap_start)
 
-    # Check for standard line intersection
-    if endpoints_close:
-        return True, 0.0
+    if overlap_length > tolerance:
+        return overlap_length
 
-    return False, 0.0
+    return 0.0
 
-def calculate_border_length(boundary1: List[Dict], boundary2: List[Dict], tolerance: float) -> float:
+def edge_tiles(edges: List[Tuple[float, ...]],
+               tile_size: int = EDGE_TILE_SIZE) -> List[Tuple[float, float, float, float, List[Tuple[float, ...]]]]:
     """
-    Calculate the total shared border length between two provinces.
+    Split an edge list into runs of tile_size consecutive edges, each with the
+    box (min_x, max_x, min_y, max_y) covering the expanded boxes of its edges.
+    Consecutive boundary edges lie close together, so the boxes stay tight.
     """
-    total_length = 0.0
-
-    # Compare all edge pairs
-    for i in range(len(boundary1)):
-        p1_start = boundary1[i]
-        p1_end = boundary1[(i + 1) % len(boundary1)]
+    tiles = []
+    for start in range(0, len(edges), tile_size):
+        tile = edges[start:start + tile_size]
+        tiles.append((min(edge[4] for edge in tile), max(edge[5] for edge in tile),
+                      min(edge[6] for edge in tile), max(edge[7] for edge in tile), tile))
 
-        for j in range(len(boundary2)):
-            p2_start = boundary2[j]
-            p2_end = boundary2[(j + 1) % len(boundary2)]
-
-            intersects, shared_length = segments_intersect(
-                p1_start, p1_end, p2_start, p2_end, tolerance
-            )
-
-            if intersects and shared_length > 0:
-                total_length += shared_length
-
-    return total_length
+    return tiles
 
-def are_neighbors(boundary1: List[Dict], boundary2: List[Dict], tolerance: float) -> bool:
+def border_length_from_edges(edges1: List[Tuple[float, ...]], edges2: List[Tuple[float, ...]],
+                             tolerance: float) -> float:
     """
-    Check if two provinces share a border.
-    Faster check that returns as soon as an intersection is found.
+    Calculate the total shared border length between two precomputed edge lists.
+    Most edge pairs are far apart, so their expanded boxes are compared inline
+    and edge_overlap_length is only called for pairs whose boxes overlap.
+    edges2 is walked in tiles (see edge_tiles) so a whole tile out of reach of
+    an edge is skipped with one box test; pairs are still summed in order.
     """
-    for i in range(len(boundary1)):
-        p1_start = boundary1[i]
-        p1_end = boundary1[(i + 1) % len(boundary1)]
-
-        for j in range(len(boundary2)):
-            p2_start = boundary2[j]
-            p2_end = boundary2[(j + 1) % len(boundary2)]
+    total_length = 0.0
 
-            intersects, _ = segments_intersect(
-                p1_start, p1_end, p2_start, p2_end, tolerance
-            )
+    # Called for every edge pair, so the function is looked up once as a local
+    overlap_length = edge_overlap_length
+    tiles = edge_tiles(edges2)
+    for edge_a in edges1:
+        a_min_x, a_max_x, a_min_y, a_max_y = edge_a[4:8]
+        for t_min_x, t_max_x, t_min_y, t_max_y, tile in tiles:
+            if a_max_x < t_min_x or t_max_x < a_min_x or a_max_y < t_min_y or t_max_y < a_min_y:
+                continue
+            for edge_b in tile:
+                if (a_max_x < edge_b[4] or edge_b[5] < a_min_x or
+                    a_max_y < edge_b[6] or edge_b[7] < a_min_y):
+                    continue
+                total_length += overlap_length(edge_a, edge_b, tolerance)
 
-            if intersects:
-                return True
+    return total_length
 
-    return False
+def bbox_diagonal(bbox: Dict[str, float]) -> float:
+    """Length of the diagonal of a bounding box."""
+    width = bbox['max_x'] - bbox['min_x']
+    height = bbox['max_y'] - bbox['min_y']
+    return math.sqrt(width * width + height * height)
 
-def calculate_adaptive_tolerance(provinces: List[Dict]) -> float:
+def calculate_adaptive_tolerance(provinces: List[Dict],
+                                 province_coords: List[Tuple[List[float], List[float]]] = None,
+                                 bboxes: List[Dict] = None) -> float:
     """
     Calculate an adaptive tolerance based on province sizes.
     Uses 0.5% of median province diagonal.
+    Pass province_coords (from map_coords) and their bboxes to reuse already
+    split boundaries and bounding boxes.
     """
-    diagonals = []
+    if province_coords is None:
+        province_coords = [boundary_coords(p.get('boundary', [])) for p in provinces]
 
-    for province in provinces:
-        boundary = province.get('boundary', [])
-        if len(boundary) < 3:
-            continue
+    if bboxes is None:
+        bboxes = [coords_bounding_box(xs, ys) for xs, ys in province_coords]
 
-        xs = [p['x'] for p in boundary]
-        ys = [p['y'] for p in boundary]
-
-        width = max(xs) - min(xs)
-        height = max(ys) - min(ys)
-        diagonal = math.sqrt(width * width + height * height)
-        diagonals.append(diagonal)
+    diagonals = [bbox_diagonal(bbox) for (xs, _), bbox in zip(province_coords, bboxes)
+                 if len(xs) >= 3]
 
     if not diagonals:
         return 1.0  # Default fallback
@@ -191,13 +231,42 @@ def bounding_boxes_overlap(bbox1: Dict, bbox2: Dict, tolerance: float) -> bool:
                 bbox1['max_y'] + tolerance < bbox2['min_y'] or
                 bbox2['max_y'] + tolerance < bbox1['min_y'])
 
+def edges_near_bbox(edges: List[Tuple[float, ...]], bbox: Dict[str, float],
+                    tolerance: float) -> List[Tuple[float, ...]]:
+    """
+    Edges (from coords_to_edges) that can touch a province with bounding box bbox.
+    Edges whose tolerance-expanded box misses bbox expanded by tolerance
+    measure 0.0 against every edge of that province, so dropping them
+    does not change the border length.
+    """
+    min_x = bbox['min_x'] - tolerance
+    max_x = bbox['max_x'] + tolerance
+    min_y = bbox['min_y'] - tolerance
+    max_y = bbox['max_y'] + tolerance
+
+    return [edge for edge in edges
+            if not (edge[5] < min_x or max_x < edge[4] or edge[7] < min_y or max_y < edge[6])]
+
+def pair_border_length(edges1: List[Tuple[float, ...]], edges2: List[Tuple[float, ...]],
+                       bbox1: Dict[str, float], bbox2: Dict[str, float], tolerance: float) -> float:
+    """
+    Shared border length of two provinces, comparing only the edges of each
+    that reach into the other's bounding box (same result as border_length_from_edges).
+    """
+    near1 = edges_near_bbox(edges1, bbox2, tolerance)
+    if not near1:
+        return 0.0
+
+    return border_length_from_edges(near1, edges_near_bbox(edges2, bbox1, tolerance), tolerance)
+
 def calculate_bounding_box(boundary: List[Dict]) -> Dict[str, float]:
     """Calculate bounding box for a province boundary."""
-    if not boundary:
-        return {'min_x': 0, 'max_x': 0, 'min_y': 0, 'max_y': 0}
+    return coords_bounding_box(*boundary_coords(boundary))
 
-    xs = [p['x'] for p in boundary]
-    ys = [p['y'] for p in boundary]
+def coords_bounding_box(xs: List[float], ys: List[float]) -> Dict[str, float]:
+    """Calculate bounding box from split boundary coordinates."""
+    if not xs:
+        return {'min_x': 0, 'max_x': 0, 'min_y': 0, 'max_y': 0}
 
     return {
         'min_x': min(xs),
@@ -206,105 +275,427 @@ def calculate_bounding_box(boundary: List[Dict]) -> Dict[str, float]:
         'max_y': max(ys)
     }
 
-def add_adjacencies_to_map(map_file: Path, tolerance: float = None):
+def build_edge_index(province_edges: List[List[Tuple[float, ...]]],
+                     tolerance: float) -> Dict[Tuple[int, int], List[Tuple[int, int]]]:
     """
-    Add neighbor adjacencies to a map file.
+    Bucket every boundary edge into a uniform grid.
+    Each edge is stored as (province_index, edge_index) in every cell its
+    tolerance-expanded bounding box touches.
     """
-    print(f"\nProcessing {map_file.name}...")
+    edge_count = sum(len(edges) for edges in province_edges)
+    if edge_count == 0:
+        return {}
+
+    # Average edge length keeps most edges within one or two cells
+    total_length = sum(edge[8] for edges in province_edges for edge in edges)
+    cell_size = max(total_length / edge_count, tolerance * 2, 1e-9)
+
+    grid = {}
+    for index, edges in enumerate(province_edges):
+        for e, edge in enumerate(edges):
+            min_cx = math.floor(edge[4] / cell_size)
+            max_cx = math.floor(edge[5] / cell_size)
+            min_cy = math.floor(edge[6] / cell_size)
+            max_cy = math.floor(edge[7] / cell_size)
+
+            for cx in range(min_cx, max_cx + 1):
+                for cy in range(min_cy, max_cy + 1):
+                    grid.setdefault((cx, cy), []).append((index, e))
+
+    return grid
+
+def calculate_border_lengths_indexed(province_coords: List[Tuple[List[float], List[float]]],
+                                     tolerance: float,
+                                     known: Dict[Tuple[int, int], float] = None) -> Dict[Tuple[int, int], float]:
+    """
+    Calculate shared border lengths for all province pairs using an edge grid.
+    Only edges sharing a grid cell are compared, so the cost scales with the
+    number of nearby edges rather than with every province pair.
+    Pairs in known are skipped. Returns {(i, j): border_length} for i < j
+    for every pair that was measured, including pairs with no shared border.
+    """
+    if known is None:
+        known = {}
 
-    # Load map data
-    with open(map_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    province_edges = []
+    for xs, ys in province_coords:
+        province_edges.append(coords_to_edges(xs, ys, tolerance) if len(xs) >= 3 else [])
 
-    if 'map_region' not in data:
-        print(f"  ERROR: No map_region in {map_file.name}")
-        return
+    grid = build_edge_index(province_edges, tolerance)
 
-    provinces = data['map_region'].get('provinces', [])
-    if not provinces:
-        print(f"  ERROR: No provinces in {map_file.name}")
-        return
+    border_lengths = {}
+    compared = set()
 
-    print(f"  Found {len(provinces)} provinces")
+    for cell_edges in grid.values():
+        for a in range(len(cell_edges)):
+            index1, edge1 = cell_edges[a]
 
-    # Calculate adaptive tolerance if not provided
-    if tolerance is None:
-        tolerance = calculate_adaptive_tolerance(provinces)
+            for b in range(a + 1, len(cell_edges)):
+                index2, edge2 = cell_edges[b]
+
+                if index1 == index2:
+                    continue
+
+                # Always measure from the lower province index, matching the pair loop
+                if index1 < index2:
+                    key = (index1, edge1, index2, edge2)
+                else:
+                    key = (index2, edge2, index1, edge1)
+
+                pair = (key[0], key[2])
+                if pair in known:
+                    continue
+
+                # Edges spanning several cells meet more than once
+                if key in compared:
+                    continue
+                compared.add(key)
 
+                shared_length = edge_overlap_length(
+                    province_edges[key[0]][key[1]],
+                    province_edges[key[2]][key[3]],
+                    tolerance
+                )
+
+                border_lengths[pair] = border_lengths.get(pair, 0.0) + shared_length
+
+    return border_lengths
+
+def find_candidate_pairs(province_coords: List[Tuple[List[float], List[float]]], bboxes: List[Dict],
+                         tolerance: float) -> List[Tuple[int, int]]:
+    """
+    Find province pairs whose bounding boxes overlap (with tolerance).
+    Sweeps provinces in order of min_x so pairs that are far apart on the
+    x axis are never visited. Returns sorted (i, j) pairs with i < j.
+    """
+    valid = [i for i, (xs, _) in enumerate(province_coords) if len(xs) >= 3]
+    valid.sort(key=lambda i: bboxes[i]['min_x'])
+
+    pairs = []
+    for a in range(len(valid)):
+        i = valid[a]
+
+        for b in range(a + 1, len(valid)):
+            j = valid[b]
+
+            # Every later province starts even further right
+            if bboxes[i]['max_x'] + tolerance < bboxes[j]['min_x']:
+                break
+
+            if bounding_boxes_overlap(bboxes[i], bboxes[j], tolerance):
+                pairs.append((min(i, j), max(i, j)))
+
+    pairs.sort()
+    return pairs
+
+# Per-process state for parallel pair measurement, set once by the pool initializer
+_worker_edges = None
+_worker_tolerance = None
+_worker_bboxes = None
+
+def _init_pair_worker(xs: array, ys: array, offsets: List[int], tolerance: float,
+                      bboxes: List[Dict] = None):
+    """
+    Pool initializer: build every province's edge list from the packed
+    coordinates (see pack_coords) and keep it, and the boxes, in the worker.
+    """
+    global _worker_edges, _worker_tolerance, _worker_bboxes
+    _worker_edges = [coords_to_edges(province_xs, province_ys, tolerance)
+                     for province_xs, province_ys in unpack_coords(xs, ys, offsets)]
+    _worker_tolerance = tolerance
+    _worker_bboxes = bboxes
+
+def _measure_pair_chunk(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int, float]]:
+    """Measure the shared border of every pair in a chunk (runs in a worker)."""
+    if _worker_bboxes is not None:
+        return [(i, j, pair_border_length(_worker_edges[i], _worker_edges[j],
+                                          _worker_bboxes[i], _worker_bboxes[j], _worker_tolerance))
+                for i, j in pairs]
+
+    return [(i, j, border_length_from_edges(_worker_edges[i], _worker_edges[j], _worker_tolerance))
+            for i, j in pairs]
+
+def measure_pairs_parallel(province_coords: List[Tuple[List[float], List[float]]],
+                           pairs: List[Tuple[int, int]], tolerance: float, workers: int,
+                           bboxes: List[Dict] = None) -> List[Tuple[int, int, float]]:
+    """
+    Measure the shared border of every pair in worker processes.
+    The coordinates are sent to each worker once as flat arrays, and each
+    worker builds the edge lists itself (bboxes enable pair_border_length).
+    Returns (i, j, border_length) in the order of pairs.
+    """
+    chunks = [pairs[k:k + PARALLEL_CHUNK_SIZE] for k in range(0, len(pairs), PARALLEL_CHUNK_SIZE)]
+
+    measured = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_pair_worker,
+                             initargs=(*pack_coords(province_coords), tolerance, bboxes)) as executor:
+        for results in executor.map(_measure_pair_chunk, chunks):
+            measured.extend(results)
+
+    return measured
+
+def pair_work(province_coords: List[Tuple[List[float], List[float]]],
+              pairs: List[Tuple[int, int]]) -> int:
+    """Estimate the cost of measuring pairs as the number of vertex pairs they compare."""
+    sizes = [len(xs) for xs, _ in province_coords]
+    return sum(sizes[i] * sizes[j] for i, j in pairs)
+
+def calculate_border_lengths_pairwise(province_coords: List[Tuple[List[float], List[float]]],
+                                      tolerance: float, workers: int = None,
+                                      known: Dict[Tuple[int, int], float] = None,
+                                      bboxes: List[Dict] = None) -> Dict[Tuple[int, int], float]:
+    """
+    Calculate shared border lengths for every province pair with overlapping bounds.
+    Candidate sets with enough work (see PARALLEL_MIN_VERTEX_PAIRS) are split
+    across worker processes (workers defaults to the CPU count). Pairs in known
+    are skipped; bboxes may be passed in if they were already computed. Returns {(i, j): border_length} for i < j for
+    every measured candidate pair, including pairs with no shared border.
+    """
     # Pre-calculate bounding boxes for spatial optimization
-    print(f"  Pre-calculating bounding boxes...")
-    bboxes = []
-    for province in provinces:
-        bbox = calculate_bounding_box(province.get('boundary', []))
-        bboxes.append(bbox)
+    if bboxes is None:
+        print(f"  Pre-calculating bounding boxes...")
+        bboxes = [coords_bounding_box(xs, ys) for xs, ys in province_coords]
 
-    # Clear existing neighbors
-    for province in provinces:
-        province['neighbors'] = []
+    # Bounding box pre-filter (FAST) - skip provinces far apart
+    candidate_pairs = find_candidate_pairs(province_coords, bboxes, tolerance * 2)
+    print(f"  {len(candidate_pairs)} candidate pairs after bounding box filter")
+
+    if known:
+        candidate_pairs = [pair for pair in candidate_pairs if pair not in known]
+        print(f"  {len(candidate_pairs)} pairs left to measure after cache lookup")
+
+    if not candidate_pairs:
+        return {}
+
+    border_lengths = {}
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers > 1 and pair_work(province_coords, candidate_pairs) >= PARALLEL_MIN_VERTEX_PAIRS:
+        print(f"  Measuring borders with {workers} worker processes...")
+        for i, j, border_length in measure_pairs_parallel(province_coords, candidate_pairs,
+                                                          tolerance, workers, bboxes):
+            border_lengths[(i, j)] = border_length
 
-    # Calculate adjacencies with progress indicator
-    total_adjacencies = 0
-    max_neighbors = 0
-    isolated_provinces = []
+        return border_lengths
+
+    # Edge geometry is reused by every pair the province takes part in
+    province_edges = [coords_to_edges(xs, ys, tolerance) for xs, ys in province_coords]
 
-    total_pairs = (len(provinces) * (len(provinces) - 1)) // 2
     checked_pairs = 0
     last_progress = 0
+    shared_borders = 0
 
-    for i in range(len(provinces)):
-        prov1 = provinces[i]
-        boundary1 = prov1.get('boundary', [])
+    for i, j in candidate_pairs:
+        checked_pairs += 1
 
-        if len(boundary1) < 3:
-            print(f"  WARNING: Province {prov1.get('name', prov1.get('id'))} has invalid boundary")
-            continue
+        # Progress indicator every 10%
+        progress = (checked_pairs * 100) // len(candidate_pairs)
+        if progress >= last_progress + 10:
+            print(f"  Progress: {progress}% ({checked_pairs}/{len(candidate_pairs)} pairs checked, {shared_borders} shared borders found)")
+            last_progress = progress
 
-        for j in range(i + 1, len(provinces)):
-            prov2 = provinces[j]
-            boundary2 = prov2.get('boundary', [])
+        # Detailed check (SLOW) - a single pass both detects and measures the border
+        border_length = border_length_from_edges(province_edges[i], province_edges[j], tolerance)
+        border_lengths[(i, j)] = border_length
+        if border_length > 0:
+            shared_borders += 1
 
-            if len(boundary2) < 3:
-                continue
+    return border_lengths
+
+def calculate_border_lengths_shapely(province_coords: List[Tuple[List[float], List[float]]],
+                                     tolerance: float) -> Dict[Tuple[int, int], float]:
+    """
+    Calculate shared border lengths with shapely (GEOS).
+    Each boundary ring is buffered by the tolerance, an STRtree finds the
+    buffers that intersect, and the border length is the length of one ring
+    inside the other's buffer. Raises ImportError if shapely is not installed.
+    Returns {(i, j): border_length} for i < j.
+    """
+    import shapely
 
-            checked_pairs += 1
+    valid = [i for i, (xs, _) in enumerate(province_coords) if len(xs) >= 3]
+    rings = shapely.linearrings([list(zip(*province_coords[i])) for i in valid])
+    zones = shapely.buffer(rings, tolerance)
 
-            # Progress indicator every 10%
-            progress = (checked_pairs * 100) // total_pairs
-            if progress >= last_progress + 10:
-                print(f"  Progress: {progress}% ({checked_pairs}/{total_pairs} pairs checked, {total_adjacencies} adjacencies found)")
-                last_progress = progress
+    tree = shapely.STRtree(zones)
+    left, right = tree.query(zones, predicate='intersects')
 
-            # Bounding box pre-filter (FAST)
-            if not bounding_boxes_overlap(bboxes[i], bboxes[j], tolerance * 2):
-                continue
+    # query returns both orderings of every pair (and each zone with itself)
+    keep = left < right
+    left, right = left[keep], right[keep]
 
-            # Detailed check (SLOW)
-            if not are_neighbors(boundary1, boundary2, tolerance):
-                continue
+    lengths = shapely.length(shapely.intersection(rings[left], zones[right]))
 
-            # Calculate border length
-            border_length = calculate_border_length(boundary1, boundary2, tolerance)
+    return {(valid[a], valid[b]): border_length
+            for a, b, border_length in zip(left.tolist(), right.tolist(), lengths.tolist())}
 
-            # Only add as neighbors if they share significant border
-            if border_length > tolerance:
-                # Add bidirectional neighbors with border length
-                prov1['neighbors'].append({
-                    'id': prov2['id'],
-                    'border_length': round(border_length, 2)
-                })
-                prov2['neighbors'].append({
-                    'id': prov1['id'],
-                    'border_length': round(border_length, 2)
-                })
+def boundary_hash(xs: List[float], ys: List[float]) -> str:
+    """Content hash of a boundary over its packed float64 coordinates."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(array('d', xs).tobytes())
+    digest.update(array('d', ys).tobytes())
+    return digest.hexdigest()
 
-                total_adjacencies += 1
+def load_adjacency_cache(cache_file: Path) -> Dict:
+    """Load the border length cache, or start an empty one if it is missing or unreadable."""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    return cache if isinstance(cache, dict) else {}
+
+def save_adjacency_cache(cache_file: Path, cache: Dict):
+    """Write the border length cache next to the maps, replacing it atomically."""
+    replace_file(cache_file, encode_json(cache, compact=True))
+
+def cached_border_lengths(entry: Dict, hashes: List[str],
+                          tolerance: float) -> Dict[Tuple[int, int], float]:
+    """
+    Look up border lengths for province pairs whose boundaries are unchanged.
+    entry is the cache entry for one map: {'tolerance': t, 'pairs': {h1: {h2: length}}}
+    with h1 <= h2. Returns {(i, j): border_length} for i < j.
+    """
+    if not entry or entry.get('tolerance') != tolerance:
+        return {}
+
+    by_hash = {}
+    for index, province_hash in enumerate(hashes):
+        by_hash.setdefault(province_hash, []).append(index)
+
+    known = {}
+    pairs = entry.get('pairs', {})
+
+    for hash1, indices1 in by_hash.items():
+        for hash2, border_length in pairs.get(hash1, {}).items():
+            for i in indices1:
+                for j in by_hash.get(hash2, ()):
+                    if i != j:
+                        known[(min(i, j), max(i, j))] = border_length
+
+    return known
+
+def border_cache_entry(border_lengths: Dict[Tuple[int, int], float], hashes: List[str],
+                       tolerance: float) -> Dict:
+    """Build the cache entry for one map from its measured border lengths."""
+    pairs = {}
+    for (i, j), border_length in border_lengths.items():
+        hash1, hash2 = sorted((hashes[i], hashes[j]))
+        pairs.setdefault(hash1, {})[hash2] = border_length
+
+    return {'tolerance': tolerance, 'pairs': pairs}
+
+def measure_border_lengths(map_name: str, province_coords: List[Tuple[List[float], List[float]]],
+                           tolerance: float, workers: int = None, cache: Dict = None,
+                           bboxes: List[Dict] = None) -> Dict[Tuple[int, int], float]:
+    """
+    Measure shared border lengths with the built-in edge matching, picking the
+    indexed or pairwise path by map size. When cache is given, unchanged pairs
+    are reused and the map's cache entry is refreshed.
+    Returns {(i, j): border_length} for i < j.
+    """
+    # Reuse border lengths for pairs whose boundaries have not changed
+    known = {}
+    if cache is not None:
+        hashes = [boundary_hash(xs, ys) for xs, ys in province_coords]
+        known = cached_border_lengths(cache.get(map_name), hashes, tolerance)
+        if known:
+            print(f"  Reusing {len(known)} cached province pairs")
+
+    if len(province_coords) >= SPATIAL_INDEX_MIN_PROVINCES:
+        print(f"  Building edge spatial index...")
+        border_lengths = calculate_border_lengths_indexed(province_coords, tolerance, known)
+    else:
+        border_lengths = calculate_border_lengths_pairwise(province_coords, tolerance, workers,
+                                                           known, bboxes)
+
+    border_lengths.update(known)
+
+    if cache is not None:
+        cache[map_name] = border_cache_entry(border_lengths, hashes, tolerance)
+
+    return border_lengths
+
+def compute_adjacencies(map_file: Path, tolerance: float = None, workers: int = None,
+                        cache: Dict = None, use_shapely: bool = False) -> Optional[Tuple[Dict, bytes]]:
+    """
+    Load a map file and fill in neighbor adjacencies in memory.
+    Returns (map_data, original_bytes), or None if the map has no provinces.
+    workers limits the number of processes used for dense candidate sets.
+    When cache is given, pairs whose boundaries are unchanged since the last
+    run reuse their cached border length, and the map's entry is refreshed.
+    use_shapely measures borders with GEOS instead, falling back to the
+    built-in edge matching if shapely is not installed (no caching in that mode).
+    """
+    print(f"\nProcessing {map_file.name}...")
+
+    # Load map data (raw bytes are kept for the backup below)
+    raw = map_file.read_bytes()
+    data = parse_json(raw)
+
+    if 'map_region' not in data:
+        print(f"  ERROR: No map_region in {map_file.name}")
+        return None
+
+    provinces = data['map_region'].get('provinces', [])
+    if not provinces:
+        print(f"  ERROR: No provinces in {map_file.name}")
+        return None
+
+    print(f"  Found {len(provinces)} provinces")
+
+    # Split boundaries into coordinate lists once; all geometry below reuses them
+    province_coords = map_coords(provinces)
+
+    # Bounding boxes feed both the tolerance (via diagonals) and the pair filter
+    bboxes = [coords_bounding_box(xs, ys) for xs, ys in province_coords]
+
+    # Calculate adaptive tolerance if not provided
+    if tolerance is None:
+        tolerance = calculate_adaptive_tolerance(provinces, province_coords, bboxes)
 
-    # Calculate statistics
     for province in provinces:
-        neighbor_count = len(province.get('neighbors', []))
-        max_neighbors = max(max_neighbors, neighbor_count)
-        if neighbor_count == 0:
-            isolated_provinces.append(province.get('name', province.get('id')))
+        if len(province.get('boundary', [])) < 3:
+            print(f"  WARNING: Province {province.get('name', province.get('id'))} has invalid boundary")
+
+    # Calculate adjacencies
+
+    border_lengths = None
+    if use_shapely:
+        try:
+            border_lengths = calculate_border_lengths_shapely(province_coords, tolerance)
+            print(f"  Measured borders with shapely")
+        except ImportError:
+            print(f"  shapely not available, using built-in edge matching")
+
+    if border_lengths is None:
+        border_lengths = measure_border_lengths(map_file.name, province_coords, tolerance,
+                                                workers, cache, bboxes)
+
+    # Only pairs sharing a significant border become neighbors
+    adjacent_pairs = [(i, j, round(border_length, 2))
+                      for (i, j), border_length in sorted(border_lengths.items())
+                      if border_length > tolerance]
+
+    # Build every province's neighbor list, then replace the old lists in one pass
+    neighbor_lists = [[] for _ in provinces]
+    for i, j, border_length in adjacent_pairs:
+        # Add bidirectional neighbors with border length
+        neighbor_lists[i].append({'id': provinces[j]['id'], 'border_length': border_length})
+        neighbor_lists[j].append({'id': provinces[i]['id'], 'border_length': border_length})
+
+    for province, neighbors in zip(provinces, neighbor_lists):
+        province['neighbors'] = neighbors
+
+    # Calculate statistics
+    total_adjacencies = len(adjacent_pairs)
+    max_neighbors = max(len(neighbors) for neighbors in neighbor_lists)
+    isolated_provinces = [province.get('name', province.get('id'))
+                          for province, neighbors in zip(provinces, neighbor_lists)
+                          if not neighbors]
 
     print(f"  ✓ Found {total_adjacencies} adjacencies")
     print(f"  ✓ Max neighbors: {max_neighbors}")
@@ -316,22 +707,73 @@ def add_adjacencies_to_map(map_file: Path, tolerance: float = None):
         if len(isolated_provinces) > 5:
             print(f"    ... and {len(isolated_provinces) - 5} more")
 
-    # Save updated map
+    return data, raw
+
+def write_map(map_file: Path, output: bytes, raw: bytes):
+    """Back up the original map bytes (once) and replace the map with output."""
     backup_file = map_file.with_suffix('.json.backup')
     if not backup_file.exists():
-        import shutil
-        shutil.copy2(map_file, backup_file)
+        # Write the bytes already in memory rather than copying the file again
+        backup_file.write_bytes(raw)
         print(f"  Created backup: {backup_file.name}")
 
-    with open(map_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    replace_file(map_file, output)
 
     print(f"  ✓ Updated {map_file.name}")
 
+def add_adjacencies_to_map(map_file: Path, tolerance: float = None, compact: bool = False,
+                           workers: int = None):
+    """
+    Add neighbor adjacencies to a map file.
+    With compact=True the map is written without indentation; workers limits
+    the number of processes used for dense candidate sets.
+    """
+    result = compute_adjacencies(map_file, tolerance, workers)
+    if result is None:
+        return
+
+    data, raw = result
+    write_map(map_file, encode_json(data, compact), raw)
+
+def wait_for_write(future: Future, map_name: str):
+    """Wait for a background map write and report any failure."""
+    try:
+        future.result()
+    except Exception as e:
+        print(f"  ERROR writing {map_name}: {e}")
+        import traceback
+        traceback.print_exc()
+
 def main():
     """Main function."""
+    parser = argparse.ArgumentParser(description="Calculate province adjacencies for map files.")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write map files without indentation (faster, smaller, not diff-friendly)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes for small maps with densely overlapping provinces "
+             "(default: CPU count, 1 disables)",
+    )
+    parser.add_argument(
+        "--shapely",
+        action="store_true",
+        help="Measure borders with shapely/GEOS if it is installed",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Recompute every province pair instead of reusing maps/.adj_cache.json",
+    )
+    args = parser.parse_args()
+
     script_dir = Path(__file__).parent
     maps_dir = script_dir / 'maps'
+    cache_file = maps_dir / '.adj_cache.json'
 
     print("=" * 70)
     print("Calculate Province Adjacencies")
@@ -348,14 +790,40 @@ def main():
     print(f"Found {len(map_files)} map files")
     print()
 
-    # Process each map file
-    for map_file in map_files:
-        try:
-            add_adjacencies_to_map(map_file)
-        except Exception as e:
-            print(f"  ERROR processing {map_file.name}: {e}")
-            import traceback
-            traceback.print_exc()
+    cache = {} if args.no_cache else load_adjacency_cache(cache_file)
+
+    # Process each map file; each write runs in the background while the
+    # next map is being computed
+    with ThreadPoolExecutor(max_workers=1) as io_pool:
+        pending_write = None
+        pending_name = None
+
+        for map_file in map_files:
+            try:
+                result = compute_adjacencies(map_file, workers=args.workers, cache=cache,
+                                             use_shapely=args.shapely)
+                if result is not None:
+                    data, raw = result
+                    output = encode_json(data, args.compact)
+            except Exception as e:
+                print(f"  ERROR processing {map_file.name}: {e}")
+                import traceback
+                traceback.print_exc()
+                continue
+
+            # Only one write is in flight at a time
+            if pending_write is not None:
+                wait_for_write(pending_write, pending_name)
+                pending_write = None
+
+            if result is not None:
+                pending_write = io_pool.submit(write_map, map_file, output, raw)
+                pending_name = map_file.name
+
+        if pending_write is not None:
+            wait_for_write(pending_write, pending_name)
+
+    save_adjacency_cache(cache_file, cache)
 
     print()
     print("=" * 70)
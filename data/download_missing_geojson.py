@@ -16,16 +16,34 @@ Province limits select the largest regions by area to maintain playability.
 Source: Natural Earth Data (https://www.naturalearthdata.com/)
 """
 
-import json
+import argparse
+import http.client
+import io
 import os
+import sys
+import time
+import urllib.error
 import urllib.request
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+
+# GeoJSON files are read and written with the map generator's JSON helpers
+sys.path.insert(0, str(Path(__file__).parent))
+from generate_europe_maps import iter_features, write_json
 
 # Natural Earth Data URL for Admin 1 (provinces/states)
 # Using 10m (1:10m scale) for good detail
 NATURAL_EARTH_URL = "https://naturalearth.s3.amazonaws.com/10m_cultural/ne_10m_admin_1_states_provinces.zip"
 
+# Download settings: the zip is streamed into memory in chunks of this size
+DOWNLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+DOWNLOAD_TIMEOUT = 60  # seconds
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_BACKOFF = 0.5  # seconds, doubled after every failed attempt
+
+# Downloaded zips are kept here with their ETag, so unchanged data is not fetched again
+DOWNLOAD_CACHE_DIR = Path.home() / '.cache' / 'geojson_download'
+
 # Country codes to process with maximum province limits (to prevent excessive adjacency calculations)
 # Province limits are based on country size and complexity
 COUNTRIES_TO_PROCESS = {
@@ -79,43 +97,74 @@ COUNTRIES_TO_PROCESS = {
     'Iceland': {'code': 'ISL', 'max_provinces': 4},
 }
 
-def select_largest_provinces(features: List, max_count: int) -> List:
-    """Select the largest provinces by area, up to max_count."""
+# Inverted lookups for matching features to countries, built once:
+# iso_a2 (first two letters of the code) or admin name -> positions in COUNTRIES_TO_PROCESS
+COUNTRY_ENTRIES = list(COUNTRIES_TO_PROCESS.items())
+ISO2_TO_COUNTRIES = {}
+for _index, (_name, _config) in enumerate(COUNTRY_ENTRIES):
+    ISO2_TO_COUNTRIES.setdefault(_config['code'][:2], []).append(_index)
+ADMIN_TO_COUNTRY = {name: index for index, (name, _) in enumerate(COUNTRY_ENTRIES)}
+
+def matching_countries(iso_a2: str, admin: str) -> List[Tuple[str, Dict]]:
+    """
+    Countries a feature matches by iso_a2 or admin name, in
+    COUNTRIES_TO_PROCESS order (usually none or one).
+    """
+    indices = ISO2_TO_COUNTRIES.get(iso_a2, [])
+    admin_index = ADMIN_TO_COUNTRY.get(admin)
+
+    if admin_index is not None and admin_index not in indices:
+        indices = sorted(indices + [admin_index])
+
+    return [COUNTRY_ENTRIES[index] for index in indices]
+
+def country_where_clause() -> str:
+    """
+    OGR SQL filter matching the countries in COUNTRIES_TO_PROCESS, using the
+    same iso_a2/admin fields as the Python-side matching.
+    """
+    iso_codes = sorted({config['code'][:2] for config in COUNTRIES_TO_PROCESS.values()})
+    names = sorted(COUNTRIES_TO_PROCESS)
+
+    def quoted(values):
+        return ", ".join("'" + value.replace("'", "''") + "'" for value in values)
+
+    return f"iso_a2 IN ({quoted(iso_codes)}) OR admin IN ({quoted(names)})"
+
+def to_feature_dict(feature) -> Dict:
+    """Normalize a feature (dict or fiona Feature) to a plain GeoJSON dict."""
+    if isinstance(feature, dict):
+        return feature
+    if hasattr(feature, '__geo_interface__'):
+        return feature.__geo_interface__
+    return dict(feature)
+
+def feature_area(feature: Dict) -> float:
+    """
+    Area of a feature for ranking: the area_sqkm property if present, else
+    the shoelace area of its exterior rings in square degrees.
+    """
+    area = (feature.get('properties') or {}).get('area_sqkm') or 0
+
+    if area == 0:
+        # Fallback: estimate from geometry
+        geom = feature.get('geometry') or {}
+        if geom.get('type') in ['Polygon', 'MultiPolygon']:
+            area = sum(ring_area(ring) for ring in exterior_rings(geom))
+
+    return area
+
+def select_largest_provinces(features: List[Dict], max_count: int) -> List[Dict]:
+    """
+    Select the largest provinces by area, up to max_count.
+    Features must already be plain dicts (see to_feature_dict); each area is
+    computed exactly once.
+    """
     if len(features) <= max_count:
         return features
 
     # Sort by area (descending) and take the largest ones
-    features_with_area = []
-    for feature in features:
-        # Try to get area from properties
-        if hasattr(feature, 'get'):
-            props = feature.get('properties', {})
-        else:
-            props = feature['properties']
-
-        area = props.get('area_sqkm', 0)
-
-        if area == 0:
-            # Fallback: estimate from geometry
-            if hasattr(feature, 'get'):
-                geom = feature.get('geometry', {})
-            else:
-                geom = feature['geometry']
-
-            if geom and geom.get('type') in ['Polygon', 'MultiPolygon']:
-                coords = geom['coordinates']
-                if geom['type'] == 'Polygon':
-                    lons = [c[0] for c in coords[0]]
-                    lats = [c[1] for c in coords[0]]
-                else:
-                    lons = [c[0] for polygon in coords for c in polygon[0]]
-                    lats = [c[1] for polygon in coords for c in polygon[0]]
-
-                if lons and lats:
-                    # Rough area estimate
-                    area = (max(lons) - min(lons)) * (max(lats) - min(lats))
-
-        features_with_area.append((area, feature))
+    features_with_area = [(feature_area(feature), feature) for feature in features]
 
     # Sort by area descending and take top max_count
     features_with_area.sort(reverse=True, key=lambda x: x[0])
@@ -124,7 +173,133 @@ def select_largest_provinces(features: List, max_count: int) -> List:
     print(f"  Limited from {len(features)} to {len(selected)} largest provinces")
     return selected
 
-def download_natural_earth_data(output_dir: Path):
+def exterior_rings(geom: Dict) -> List:
+    """Exterior rings of a Polygon or MultiPolygon geometry."""
+    coords = geom['coordinates']
+    return [coords[0]] if geom['type'] == 'Polygon' else [polygon[0] for polygon in coords]
+
+def ring_area(ring: List) -> float:
+    """Area enclosed by a ring of positions (shoelace formula)."""
+    if len(ring) < 3:
+        return 0.0
+
+    twice_area = sum(p1[0] * p2[1] - p2[0] * p1[1]
+                     for p1, p2 in zip(ring, list(ring[1:]) + [ring[0]]))
+    return abs(twice_area) / 2
+
+def average_longitude(geom: Dict) -> float:
+    """
+    Mean longitude of the exterior ring vertices of a Polygon or MultiPolygon.
+    Sums in a single pass without building a list of longitudes.
+    """
+    rings = exterior_rings(geom)
+
+    count = sum(len(ring) for ring in rings)
+    if not count:
+        return 0
+
+    return sum(c[0] for ring in rings for c in ring) / count
+
+def is_east_of(geom: Dict, limit_lon: float) -> bool:
+    """
+    Check whether the mean exterior-ring longitude lies east of limit_lon.
+    The longitude range decides most geometries on its own: min()/max() on a
+    ring compare positions lexicographically in C, so the first element is
+    the extreme longitude. Only geometries straddling the limit need the mean.
+    """
+    rings = [ring for ring in exterior_rings(geom) if len(ring)]
+    if not rings:
+        return average_longitude(geom) > limit_lon
+
+    if min(min(ring)[0] for ring in rings) > limit_lon:
+        return True
+    if max(max(ring)[0] for ring in rings) <= limit_lon:
+        return False
+
+    return average_longitude(geom) > limit_lon
+
+def download_to_buffer(url: str, etag: str = None) -> Tuple[Optional[io.BytesIO], Optional[str]]:
+    """
+    Stream a download into an in-memory buffer, reporting progress every 10%.
+    With etag, the request is conditional: if the server reports the file as
+    unchanged (304), returns (None, etag). Otherwise returns (buffer, new_etag).
+    """
+    request = urllib.request.Request(url)
+    if etag:
+        request.add_header('If-None-Match', etag)
+
+    try:
+        response = urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, etag
+        raise
+
+    buffer = io.BytesIO()
+
+    with response:
+        total = int(response.headers.get('Content-Length') or 0)
+        last_progress = 0
+
+        while True:
+            chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            buffer.write(chunk)
+
+            if total:
+                progress = (buffer.tell() * 100) // total
+                if progress >= last_progress + 10:
+                    print(f"  Progress: {progress}%")
+                    last_progress = progress
+
+        new_etag = response.headers.get('ETag')
+
+    buffer.seek(0)
+    return buffer, new_etag
+
+def fetch_zip(url: str, use_cache: bool = True) -> io.BytesIO:
+    """
+    Fetch a zip file, reusing the cached copy in DOWNLOAD_CACHE_DIR when the
+    server's ETag shows it is unchanged. Network errors (also while reading
+    the body) and 5xx responses are retried with exponential backoff.
+    """
+    cache_file = DOWNLOAD_CACHE_DIR / url.rsplit('/', 1)[-1]
+    etag_file = cache_file.with_name(cache_file.name + '.etag')
+
+    etag = None
+    if use_cache and cache_file.exists() and etag_file.exists():
+        etag = etag_file.read_text(encoding='utf-8').strip() or None
+
+    delay = DOWNLOAD_BACKOFF
+    for attempt in range(1, DOWNLOAD_RETRIES + 1):
+        try:
+            buffer, new_etag = download_to_buffer(url, etag)
+            break
+        except (OSError, http.client.HTTPException) as e:
+            # Connection errors, timeouts and truncated bodies are retried,
+            # HTTP errors only when the server reports a 5xx
+            retryable = not isinstance(e, urllib.error.HTTPError) or e.code >= 500
+            if not retryable or attempt == DOWNLOAD_RETRIES:
+                raise
+            print(f"  Download failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+            delay *= 2
+
+    if buffer is None:
+        print(f"Not modified since last download, using cached {cache_file}")
+        return io.BytesIO(cache_file.read_bytes())
+
+    print(f"Downloaded {buffer.getbuffer().nbytes / (1 << 20):.1f} MiB")
+
+    if use_cache and new_etag:
+        DOWNLOAD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        cache_file.write_bytes(buffer.getbuffer())
+        etag_file.write_text(new_etag, encoding='utf-8')
+
+    return buffer
+
+def download_natural_earth_data(output_dir: Path, compact: bool = False, use_cache: bool = True):
     """Download Natural Earth admin-1 dataset."""
     import zipfile
     import tempfile
@@ -134,16 +309,13 @@ def download_natural_earth_data(output_dir: Path):
 
     # Create temp directory
     with tempfile.TemporaryDirectory() as tmpdir:
-        zip_path = Path(tmpdir) / "ne_admin1.zip"
-
-        # Download
+        # Download straight into memory (or reuse the cached zip if unchanged)
         print("Downloading... (this may take a minute)")
-        urllib.request.urlretrieve(NATURAL_EARTH_URL, zip_path)
-        print(f"Downloaded to {zip_path}")
+        buffer = fetch_zip(NATURAL_EARTH_URL, use_cache)
 
         # Extract
         print("Extracting...")
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        with zipfile.ZipFile(buffer, 'r') as zip_ref:
             zip_ref.extractall(tmpdir)
 
         # Find the shapefile
@@ -161,12 +333,12 @@ def download_natural_earth_data(output_dir: Path):
             from fiona.crs import from_epsg
 
             print("Processing shapefile with fiona...")
-            return process_shapefile_with_fiona(shp_file, output_dir)
+            return process_shapefile_with_fiona(shp_file, output_dir, compact)
         except ImportError:
             print("fiona not available, trying ogr2ogr...")
-            return process_shapefile_with_ogr(shp_file, output_dir, tmpdir)
+            return process_shapefile_with_ogr(shp_file, output_dir, tmpdir, compact)
 
-def process_shapefile_with_fiona(shp_file: Path, output_dir: Path):
+def process_shapefile_with_fiona(shp_file: Path, output_dir: Path, compact: bool = False):
     """Process shapefile using fiona (Python library)."""
     import fiona
 
@@ -179,34 +351,34 @@ def process_shapefile_with_fiona(shp_file: Path, output_dir: Path):
         # Group features by country
         country_features = {config['code']: [] for config in COUNTRIES_TO_PROCESS.values()}
 
-        for feature in src:
+        # Let OGR drop other countries before they are wrapped as Python
+        # features (fiona >= 1.9; older versions ignore where and yield all)
+        matching = src.filter(where=country_where_clause())
+
+        for feature in matching:
             props = feature['properties']
             iso_a2 = props.get('iso_a2', '')
             iso_3166_2 = props.get('iso_3166_2', '')
             admin = props.get('admin', '')
 
             # Match by country code
-            for country_name, config in COUNTRIES_TO_PROCESS.items():
+            for country_name, config in matching_countries(iso_a2, admin):
                 country_code = config['code']
-                if iso_a2 == country_code[:2] or admin == country_name:
-                    # For Russia, only include European part (west of 60°E longitude)
-                    if country_code == 'RUS':
-                        # Check if geometry is west of Ural Mountains (~60°E)
-                        geom = feature['geometry']
-                        if geom and geom['type'] in ['Polygon', 'MultiPolygon']:
-                            # Get centroid longitude (rough approximation)
-                            coords = geom['coordinates']
-                            if geom['type'] == 'Polygon':
-                                lons = [c[0] for c in coords[0]]
-                            else:
-                                lons = [c[0] for polygon in coords for c in polygon[0]]
-
-                            avg_lon = sum(lons) / len(lons) if lons else 0
-                            if avg_lon > 60:  # Skip Asian Russia
-                                continue
-
-                    country_features[country_code].append(feature)
-                    break
+
+                # Normalize once; everything downstream works on plain dicts
+                feature = to_feature_dict(feature)
+
+                # For Russia, only include European part (west of 60°E longitude)
+                if country_code == 'RUS':
+                    # Check if geometry is west of Ural Mountains (~60°E)
+                    geom = feature['geometry']
+                    if geom and geom['type'] in ['Polygon', 'MultiPolygon']:
+                        # Get centroid longitude (rough approximation)
+                        if is_east_of(geom, 60):  # Skip Asian Russia
+                            continue
+
+                country_features[country_code].append(feature)
+                break
 
         # Write GeoJSON files for each country
         for country_name, config in COUNTRIES_TO_PROCESS.items():
@@ -226,37 +398,28 @@ def process_shapefile_with_fiona(shp_file: Path, output_dir: Path):
                 print(f"  Limiting {country_name} provinces:")
                 features = select_largest_provinces(features, max_provinces)
 
-            # Convert fiona Feature objects to dictionaries
-            features_as_dicts = []
-            for feature in features:
-                if hasattr(feature, '__geo_interface__'):
-                    features_as_dicts.append(feature.__geo_interface__)
-                elif isinstance(feature, dict):
-                    features_as_dicts.append(feature)
-                else:
-                    features_as_dicts.append(dict(feature))
-
             geojson = {
                 "type": "FeatureCollection",
-                "features": features_as_dicts
+                "features": features
             }
 
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(geojson, f, indent=2, ensure_ascii=False)
+            write_json(output_file, geojson, compact)
 
             print(f"✓ Created {output_file.name} with {len(features)} provinces")
 
-def process_shapefile_with_ogr(shp_file: Path, output_dir: Path, tmpdir: str):
+def process_shapefile_with_ogr(shp_file: Path, output_dir: Path, tmpdir: str,
+                               compact: bool = False):
     """Process shapefile using ogr2ogr command-line tool."""
     import subprocess
 
-    # First convert entire shapefile to GeoJSON
+    # First convert the shapefile to GeoJSON, keeping only the countries we process
     geojson_file = Path(tmpdir) / "all_admin1.geojson"
 
     print(f"Converting shapefile to GeoJSON with ogr2ogr...")
     result = subprocess.run([
         'ogr2ogr',
         '-f', 'GeoJSON',
+        '-where', country_where_clause(),
         str(geojson_file),
         str(shp_file)
     ], capture_output=True, text=True)
@@ -272,37 +435,26 @@ def process_shapefile_with_ogr(shp_file: Path, output_dir: Path, tmpdir: str):
 
     print(f"Converted to {geojson_file}")
 
-    # Load and filter by country
-    with open(geojson_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
     # Group features by country
     country_features = {config['code']: [] for config in COUNTRIES_TO_PROCESS.values()}
 
-    for feature in data.get('features', []):
+    for feature in iter_features(geojson_file):
         props = feature.get('properties', {})
         iso_a2 = props.get('iso_a2', '')
         admin = props.get('admin', '')
 
-        for country_name, config in COUNTRIES_TO_PROCESS.items():
+        for country_name, config in matching_countries(iso_a2, admin):
             country_code = config['code']
-            if iso_a2 == country_code[:2] or admin == country_name:
-                # For Russia, filter European part only
-                if country_code == 'RUS':
-                    geom = feature.get('geometry', {})
-                    if geom and geom['type'] in ['Polygon', 'MultiPolygon']:
-                        coords = geom['coordinates']
-                        if geom['type'] == 'Polygon':
-                            lons = [c[0] for c in coords[0]]
-                        else:
-                            lons = [c[0] for polygon in coords for c in polygon[0]]
-
-                        avg_lon = sum(lons) / len(lons) if lons else 0
-                        if avg_lon > 60:
-                            continue
 
-                country_features[country_code].append(feature)
-                break
+            # For Russia, filter European part only
+            if country_code == 'RUS':
+                geom = feature.get('geometry', {})
+                if geom and geom['type'] in ['Polygon', 'MultiPolygon']:
+                    if is_east_of(geom, 60):
+                        continue
+
+            country_features[country_code].append(feature)
+            break
 
     # Write GeoJSON files
     for country_name, config in COUNTRIES_TO_PROCESS.items():
@@ -327,13 +479,25 @@ def process_shapefile_with_ogr(shp_file: Path, output_dir: Path, tmpdir: str):
             "features": features
         }
 
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(geojson, f, indent=2, ensure_ascii=False)
+        write_json(output_file, geojson, compact)
 
         print(f"✓ Created {output_file.name} with {len(features)} provinces")
 
 def main():
     """Main function."""
+    parser = argparse.ArgumentParser(description="Download GeoJSON data for European countries.")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write GeoJSON files without indentation (faster, smaller, not diff-friendly)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always download the Natural Earth zip instead of reusing ~/.cache/geojson_download",
+    )
+    args = parser.parse_args()
+
     script_dir = Path(__file__).parent
     geojson_dir = script_dir / 'maps' / 'geojson_source'
 
@@ -346,7 +510,7 @@ def main():
     geojson_dir.mkdir(parents=True, exist_ok=True)
 
     # Download and process
-    download_natural_earth_data(geojson_dir)
+    download_natural_earth_data(geojson_dir, args.compact, not args.no_cache)
 
     print()
     print("=" * 70)
@@ -3,10 +3,18 @@
 Generate map files for European regions from NUTS1 GeoJSON data.
 """
 
+import argparse
+import contextlib
+import io
 import json
+import mmap
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from map_projection import convert_ring
 
 # Country code to country name mapping
 COUNTRY_NAMES = {
@@ -50,107 +58,395 @@ COUNTRY_NAMES = {
     'XK': 'kosovo'
 }
 
+# Map titles ("Bosnia Herzegovina Real") for the known countries, built once
+MAP_DISPLAY_NAMES = {name: f"{name.replace('_', ' ').title()} Real" for name in COUNTRY_NAMES.values()}
+
 # Countries that already have map files (skip these)
 # CLEARED to allow full regeneration - all countries will be regenerated
 EXISTING_COUNTRIES = set()
 
-def convert_coordinates(lon: float, lat: float) -> Dict[str, float]:
-    """
-    Convert lat/lon to game coordinates.
-    Uses a simple equirectangular projection centered on Europe.
-    Y-axis is inverted because game rendering has Y+ pointing down.
-    """
-    # Center point approximately in central Europe (10°E, 50°N)
-    center_lon = 10.0
-    center_lat = 50.0
+# Province layout with the default values (these should be customized per
+# region). create_province copies it and fills in the per-province fields,
+# which keeps the key order of the written files.
+PROVINCE_TEMPLATE = {
+    "id": None,
+    "name": None,
+    "owner_realm": None,
+    "terrain_type": "plains",
+    "center": None,
+    "base_tax": 5,
+    "base_production": 5,
+    "base_manpower": 5,
+    "development": 15,
+    "boundary": None,
+    "features": None,
+    "trade_goods": "grain",
+    "culture": None,
+    "religion": "catholic",
+    "climate": "temperate"
+}
 
-    # Scale factor to convert degrees to game units
-    # Adjust this to match the scale of existing maps
-    scale = 50.0
+# Files at least this large are memory-mapped instead of read into a bytes
+# copy before parsing with orjson
+MMAP_MIN_SIZE = 64 << 20  # 64 MiB
 
-    x = (lon - center_lon) * scale
-    # Invert Y-axis: higher latitude (north) = negative Y in screen coordinates
-    y = -(lat - center_lat) * scale
+# Ramer-Douglas-Peucker tolerance (game units) applied to every boundary before
+# it is written; 0 keeps every vertex
+DEFAULT_SIMPLIFY_TOLERANCE = 0.05
 
-    return {"x": round(x, 2), "y": round(y, 2)}
+# Centi-unit boundaries store coordinates as integer hundredths of a game unit,
+# the same 0.01 precision as the rounded floats
+CENTI_UNITS_PER_UNIT = 100
 
-def extract_polygon_coords(geometry) -> List[List[Dict[str, float]]]:
-    """Extract and convert polygon coordinates from GeoJSON geometry."""
-    polygons = []
+def ring_area(ring: List[List[float]]) -> float:
+    """Area enclosed by a ring of lon/lat positions (shoelace formula)."""
+    twice_area = sum(x1 * y2 - x2 * y1
+                     for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]))
+    return abs(twice_area) / 2
 
+def largest_outer_ring(geometry) -> Optional[List[List[float]]]:
+    """
+    Pick the outer ring enclosing the largest area from GeoJSON geometry.
+    Areas are compared on the raw lon/lat positions (the projection scales
+    every area by the same factor), so only the chosen ring is converted.
+    """
     if geometry['type'] == 'Polygon':
-        # Single polygon
-        for ring in geometry['coordinates']:
-            converted_ring = [convert_coordinates(lon, lat) for lon, lat in ring]
-            polygons.append(converted_ring)
+        outer_rings = geometry['coordinates'][:1]
     elif geometry['type'] == 'MultiPolygon':
-        # Multiple polygons
-        for polygon in geometry['coordinates']:
-            for ring in polygon:
-                converted_ring = [convert_coordinates(lon, lat) for lon, lat in ring]
-                polygons.append(converted_ring)
+        outer_rings = [polygon[0] for polygon in geometry['coordinates'] if polygon]
+    else:
+        return None
 
-    return polygons
+    return max(outer_rings, key=ring_area, default=None)
+
+def simplify_ring(xs: List[float], ys: List[float],
+                  tolerance: float) -> Tuple[List[float], List[float]]:
+    """
+    Simplify a ring with the Ramer-Douglas-Peucker algorithm.
+    Drops vertices closer than tolerance to the line through the vertices
+    kept around them. The first and last vertex are always kept, and the ring
+    is returned unchanged if simplification would leave fewer than 4 vertices.
+    """
+    n = len(xs)
+    if tolerance <= 0 or n < 4:
+        return xs, ys
+
+    tolerance_sq = tolerance * tolerance
+    keep = [False] * n
+    keep[0] = keep[n - 1] = True
+
+    # Explicit stack instead of recursion: rings can have thousands of vertices
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        ax, ay = xs[start], ys[start]
+        dx = xs[end] - ax
+        dy = ys[end] - ay
+        segment_sq = dx * dx + dy * dy
+
+        farthest = -1
+        farthest_sq = tolerance_sq
+        for i in range(start + 1, end):
+            px = xs[i] - ax
+            py = ys[i] - ay
+            if segment_sq > 0:
+                # Squared distance to the line through start and end
+                cross = px * dy - py * dx
+                distance_sq = cross * cross / segment_sq
+            else:
+                # Closed ring: start and end are the same point
+                distance_sq = px * px + py * py
+
+            if distance_sq > farthest_sq:
+                farthest = i
+                farthest_sq = distance_sq
+
+        if farthest >= 0:
+            keep[farthest] = True
+            stack.append((start, farthest))
+            stack.append((farthest, end))
+
+    kept = [i for i in range(n) if keep[i]]
+    if len(kept) < 4:
+        return xs, ys
+
+    return [xs[i] for i in kept], [ys[i] for i in kept]
+
+def ring_to_boundary(xs: List[float], ys: List[float]) -> List[Dict[str, float]]:
+    """Build the {"x", "y"} point list stored in map files from x and y lists."""
+    return [{"x": x, "y": y} for x, y in zip(xs, ys)]
+
+def ring_to_points(xs: List[float], ys: List[float]) -> List[List[float]]:
+    """Build a GeoJSON-style [x, y] pair list from x and y lists."""
+    return [[x, y] for x, y in zip(xs, ys)]
+
+def ring_to_centi_boundary(xs: List[float], ys: List[float]) -> List[Dict[str, int]]:
+    """Build {"x_cu", "y_cu"} points with integer centi-unit coordinates."""
+    return [{"x_cu": round(x * CENTI_UNITS_PER_UNIT), "y_cu": round(y * CENTI_UNITS_PER_UNIT)}
+            for x, y in zip(xs, ys)]
+
+def ring_to_centi_points(xs: List[float], ys: List[float]) -> List[List[int]]:
+    """Build [x, y] pairs with integer centi-unit coordinates."""
+    return [[round(x * CENTI_UNITS_PER_UNIT), round(y * CENTI_UNITS_PER_UNIT)]
+            for x, y in zip(xs, ys)]
+
+def ring_encoder(point_arrays: bool = False,
+                 centi_units: bool = False) -> Callable[[List[float], List[float]], List]:
+    """Pick the function that turns a ring's x and y lists into a stored boundary."""
+    if centi_units:
+        return ring_to_centi_points if point_arrays else ring_to_centi_boundary
+    return ring_to_points if point_arrays else ring_to_boundary
 
 def calculate_center(boundary: List[Dict[str, float]]) -> Dict[str, float]:
     """Calculate the centroid of a polygon."""
-    if not boundary:
+    return coords_center([point['x'] for point in boundary], [point['y'] for point in boundary])
+
+def coords_center(xs: List[float], ys: List[float]) -> Dict[str, float]:
+    """Calculate the centroid of a polygon given as x and y lists."""
+    if not xs:
         return {"x": 0.0, "y": 0.0}
 
-    x_sum = sum(point['x'] for point in boundary)
-    y_sum = sum(point['y'] for point in boundary)
-    n = len(boundary)
+    n = len(xs)
 
     return {
-        "x": round(x_sum / n, 2),
-        "y": round(y_sum / n, 2)
+        "x": round(sum(xs) / n, 2),
+        "y": round(sum(ys) / n, 2)
     }
 
-def calculate_bounds(provinces: List[Dict]) -> Dict[str, float]:
-    """Calculate bounding box for all provinces."""
-    if not provinces:
-        return {"min_x": 0, "max_x": 0, "min_y": 0, "max_y": 0}
-
-    all_x = []
-    all_y = []
-
-    for province in provinces:
-        for point in province['boundary']:
-            all_x.append(point['x'])
-            all_y.append(point['y'])
+def extend_bounds(bounds: Optional[Dict[str, float]],
+                  xs: List[float], ys: List[float]) -> Dict[str, float]:
+    """
+    Grow a running bounding box to cover one more ring (None starts a new box).
+    The generators call this as each province is built, so the boundaries
+    are not walked a second time to find the map bounds.
+    """
+    ring_bounds = {
+        "min_x": round(min(xs), 2),
+        "max_x": round(max(xs), 2),
+        "min_y": round(min(ys), 2),
+        "max_y": round(max(ys), 2)
+    }
+    if bounds is None:
+        return ring_bounds
 
     return {
-        "min_x": round(min(all_x), 2),
-        "max_x": round(max(all_x), 2),
-        "min_y": round(min(all_y), 2),
-        "max_y": round(max(all_y), 2)
+        "min_x": min(bounds["min_x"], ring_bounds["min_x"]),
+        "max_x": max(bounds["max_x"], ring_bounds["max_x"]),
+        "min_y": min(bounds["min_y"], ring_bounds["min_y"]),
+        "max_y": max(bounds["max_y"], ring_bounds["max_y"])
     }
 
 def create_province(region_id: int, region_name: str, boundary: List[Dict[str, float]],
-                   country_name: str) -> Dict:
-    """Create a province data structure."""
-    center = calculate_center(boundary)
+                   country_name: str, center: Dict[str, float] = None) -> Dict:
+    """Create a province data structure (center is calculated if not given)."""
+    if center is None:
+        center = calculate_center(boundary)
+
+    province = PROVINCE_TEMPLATE.copy()
+    province["id"] = region_id
+    province["name"] = region_name
+    province["owner_realm"] = country_name
+    province["center"] = center
+    province["boundary"] = boundary
+    province["features"] = []
+    province["culture"] = country_name
+    return province
+
+def map_display_name(country_name: str) -> str:
+    """Title of a country's map, e.g. 'czech_republic' -> 'Czech Republic Real'."""
+    display_name = MAP_DISPLAY_NAMES.get(country_name)
+    if display_name is None:
+        display_name = f"{country_name.replace('_', ' ').title()} Real"
+    return display_name
+
+@contextlib.contextmanager
+def file_contents(input_file: Path):
+    """
+    Yield the raw bytes of a file for a parser that accepts buffers.
+    Files of MMAP_MIN_SIZE and up are memory-mapped and yielded as a
+    memoryview, so the parser reads the page cache without a copy; nothing
+    parsed from the view may keep a reference into it after the block.
+    """
+    with open(input_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_MIN_SIZE:
+            yield f.read()
+            return
 
-    # Default values - these should be customized per region
-    return {
-        "id": region_id,
-        "name": region_name,
-        "owner_realm": country_name,
-        "terrain_type": "plains",
-        "center": center,
-        "base_tax": 5,
-        "base_production": 5,
-        "base_manpower": 5,
-        "development": 15,
-        "boundary": boundary,
-        "features": [],
-        "trade_goods": "grain",
-        "culture": country_name,
-        "religion": "catholic",
-        "climate": "temperate"
-    }
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                view.release()
+
+def parse_json(contents: bytes):
+    """Parse JSON bytes already in memory, with orjson when it is installed."""
+    try:
+        import orjson
+    except ImportError:
+        return json.loads(contents)
+
+    return orjson.loads(contents)
+
+def read_json(input_file: Path):
+    """
+    Parse a JSON file, with orjson when it is installed.
+    Large files are memory-mapped so orjson parses the page cache directly
+    (see file_contents); without orjson the stdlib parser is used.
+    """
+    try:
+        import orjson
+    except ImportError:
+        with open(input_file, 'rb') as f:
+            return json.load(f)
+
+    with file_contents(input_file) as contents:
+        return orjson.loads(contents)
+
+def iter_features(geojson_file: Path):
+    """
+    Yield the features of a GeoJSON FeatureCollection.
+    With ijson installed the file is streamed one feature at a time instead
+    of being parsed into memory as a whole; otherwise falls back to read_json.
+    """
+    try:
+        import ijson
+    except ImportError:
+        yield from read_json(geojson_file).get('features', [])
+        return
+
+    with open(geojson_file, 'rb') as f:
+        yield from ijson.items(f, 'features.item', use_float=True)
+
+def encode_inline_boundaries(data: Dict) -> bytes:
+    """
+    Encode a map as indent=2 JSON with every province boundary on one line.
+    Boundaries are most of a map file; writing them without whitespace makes
+    the file several times smaller while the rest stays readable. The
+    boundary points keep their {"x", "y"} layout.
+    """
+    map_region = dict(data['map_region'])
+    provinces = map_region.get('provinces', [])
+
+    try:
+        import orjson
+        fragment = orjson.Fragment
+    except (ImportError, AttributeError):
+        orjson = None
+
+    if orjson is not None:
+        # Pre-encoded boundaries are embedded verbatim by the indenting encoder
+        map_region['provinces'] = [
+            {**province, 'boundary': fragment(orjson.dumps(province['boundary']))}
+            if 'boundary' in province else province
+            for province in provinces
+        ]
+        return orjson.dumps({**data, 'map_region': map_region}, option=orjson.OPT_INDENT_2)
+
+    # The stdlib encoder has no raw fragments: encode placeholder strings and
+    # swap in the compact boundaries afterwards (the NUL keeps them unique)
+    boundaries = []
+    placeholder_provinces = []
+    for province in provinces:
+        if 'boundary' in province:
+            boundaries.append(json.dumps(province['boundary'], separators=(',', ':'), ensure_ascii=False))
+            province = {**province, 'boundary': f"\0boundary{len(boundaries) - 1}"}
+        placeholder_provinces.append(province)
+    map_region['provinces'] = placeholder_provinces
+
+    output = json.dumps({**data, 'map_region': map_region}, indent=2, ensure_ascii=False)
+    output = re.sub(r'"\\u0000boundary(\d+)"', lambda match: boundaries[int(match.group(1))], output)
+    return output.encode('utf-8')
+
+@contextlib.contextmanager
+def replacing_file(output_file: Path):
+    """
+    Open a file next to output_file for writing and rename it into place on
+    success, so readers never see a half-written map and a hardlinked backup
+    keeps the old file. On error the partial file is removed.
+    """
+    temp_file = output_file.with_name(output_file.name + '.tmp')
+    try:
+        with open(temp_file, 'wb') as f:
+            yield f
+        os.replace(temp_file, output_file)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            temp_file.unlink()
+        raise
+
+def replace_file(output_file: Path, payload: bytes):
+    """Write payload to output_file atomically (see replacing_file)."""
+    with replacing_file(output_file) as f:
+        f.write(payload)
+
+def encode_json(data, compact: bool = False) -> bytes:
+    """
+    Encode data as indent=2 or compact JSON in UTF-8. orjson is used when it
+    is installed, which produces the same bytes as the stdlib encoder for
+    map data (strings, ints and floats rounded to 2 decimals).
+    """
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
 
-def generate_map_file(country_code: str, regions: List[Dict], output_dir: Path):
+    if orjson is not None:
+        return orjson.dumps(data, option=0 if compact else orjson.OPT_INDENT_2)
+
+    if compact:
+        output = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    else:
+        output = json.dumps(data, indent=2, ensure_ascii=False)
+    return output.encode('utf-8')
+
+def write_json(output_file: Path, data: Dict, compact: bool = False,
+               inline_boundaries: bool = False):
+    """
+    Write JSON to a file with a single write call, replacing it atomically.
+    The default keeps the diff-friendly indent=2 layout, compact output has
+    no whitespace (see encode_json).
+    inline_boundaries keeps the indented layout but writes each province
+    boundary of a map on one line (see encode_inline_boundaries).
+    """
+    if inline_boundaries and not compact:
+        replace_file(output_file, encode_inline_boundaries(data))
+        return
+
+    replace_file(output_file, encode_json(data, compact))
+
+def write_map_streamed(output_file: Path, data: Dict, provinces: Iterable[Dict],
+                       compact: bool = False):
+    """
+    Write a map file the way write_json would, encoding one province at a time.
+    The provinces come from the iterable and are written in the place of
+    data['map_region']['provinces'] (which only fixes the key order), so
+    neither a list of every province nor the whole encoded map is held in
+    memory. The file has the same bytes as write_json with the provinces in place.
+    """
+    # Encode the map around a placeholder, then write the provinces in its place
+    scaffold = {**data, 'map_region': {**data['map_region'], 'provinces': "\0provinces"}}
+    head, tail = encode_json(scaffold, compact).split(b'"\\u0000provinces"')
+
+    # With indent=2 the list items sit three levels deep, inside map_region
+    item_indent = b'\n      '
+    with replacing_file(output_file) as f:
+        f.write(head + b'[')
+        separator = b''
+        for province in provinces:
+            if compact:
+                f.write(separator + encode_json(province, compact))
+            else:
+                f.write(separator + item_indent + encode_json(province).replace(b'\n', item_indent))
+            separator = b','
+        if separator and not compact:
+            f.write(b'\n    ')
+        f.write(b']' + tail)
+
+def generate_map_file(country_code: str, regions: List[Dict], output_dir: Path,
+                      compact: bool = False,
+                      simplify_tolerance: float = DEFAULT_SIMPLIFY_TOLERANCE,
+                      point_arrays: bool = False, centi_units: bool = False):
     """Generate a map file for a country."""
     country_name = COUNTRY_NAMES.get(country_code, country_code.lower())
 
@@ -160,34 +456,34 @@ def generate_map_file(country_code: str, regions: List[Dict], output_dir: Path):
         return
 
     provinces = []
+    bounds = None
     province_id = 100
+    encode_ring = ring_encoder(point_arrays, centi_units)
 
     for region in regions:
         region_name = region['properties']['na']
         geometry = region['geometry']
 
-        # Extract polygons (use the largest one as the main boundary)
-        polygons = extract_polygon_coords(geometry)
-        if polygons:
-            # Use the largest polygon
-            main_polygon = max(polygons, key=len)
+        # Use the largest polygon by enclosed area (not by vertex count) as the main boundary
+        ring = largest_outer_ring(geometry)
+        if ring:
+            xs, ys = simplify_ring(*convert_ring(ring), simplify_tolerance)
 
-            province = create_province(province_id, region_name, main_polygon, country_name)
+            province = create_province(province_id, region_name, encode_ring(xs, ys),
+                                       country_name, coords_center(xs, ys))
             provinces.append(province)
+            bounds = extend_bounds(bounds, xs, ys)
             province_id += 1
 
     if not provinces:
         print(f"No provinces found for {country_name}")
         return
 
-    # Calculate bounds
-    bounds = calculate_bounds(provinces)
-
     # Create map data structure
     map_data = {
         "map_region": {
             "id": f"{country_name}_real",
-            "name": f"{country_name.replace('_', ' ').title()} Real",
+            "name": map_display_name(country_name),
             "description": f"Real geographic boundaries for {country_name}",
             "coordinate_system": "cartesian_2d",
             "unit": "game_units",
@@ -197,15 +493,20 @@ def generate_map_file(country_code: str, regions: List[Dict], output_dir: Path):
             "trade_nodes": []
         }
     }
+    if centi_units:
+        # Center and bounds stay in game units; only the boundaries are integers
+        map_data["map_region"]["boundary_unit"] = "centi_game_units"
 
     # Write to file
     output_file = output_dir / f"map_{country_name}_real.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(map_data, f, indent=2, ensure_ascii=False)
+    write_json(output_file, map_data, compact)
 
     print(f"Created {output_file.name} with {len(provinces)} provinces")
 
-def generate_map_file_from_features(country_name: str, features: List[Dict], output_dir: Path):
+def generate_map_file_from_features(country_name: str, features: List[Dict], output_dir: Path,
+                                    compact: bool = False,
+                                    simplify_tolerance: float = DEFAULT_SIMPLIFY_TOLERANCE,
+                                    point_arrays: bool = False, centi_units: bool = False):
     """Generate a map file directly from GeoJSON features."""
     # REGENERATION MODE: Allow overwriting existing files
     output_file = output_dir / f"map_{country_name}_real.json"
@@ -217,7 +518,9 @@ def generate_map_file_from_features(country_name: str, features: List[Dict], out
         return
 
     provinces = []
+    bounds = None
     province_id = 100
+    encode_ring = ring_encoder(point_arrays, centi_units)
 
     for feature in features:
         # Try different property names for region name
@@ -230,28 +533,26 @@ def generate_map_file_from_features(country_name: str, features: List[Dict], out
         if not geometry:
             continue
 
-        # Extract polygons (use the largest one as the main boundary)
-        polygons = extract_polygon_coords(geometry)
-        if polygons:
-            # Use the largest polygon
-            main_polygon = max(polygons, key=len)
+        # Use the largest polygon by enclosed area (not by vertex count) as the main boundary
+        ring = largest_outer_ring(geometry)
+        if ring:
+            xs, ys = simplify_ring(*convert_ring(ring), simplify_tolerance)
 
-            province = create_province(province_id, region_name, main_polygon, country_name)
+            province = create_province(province_id, region_name, encode_ring(xs, ys),
+                                       country_name, coords_center(xs, ys))
             provinces.append(province)
+            bounds = extend_bounds(bounds, xs, ys)
             province_id += 1
 
     if not provinces:
         print(f"  No provinces found for {country_name}")
         return
 
-    # Calculate bounds
-    bounds = calculate_bounds(provinces)
-
     # Create map data structure
     map_data = {
         "map_region": {
             "id": f"{country_name}_real",
-            "name": f"{country_name.replace('_', ' ').title()} Real",
+            "name": map_display_name(country_name),
             "description": f"Real geographic boundaries for {country_name}",
             "coordinate_system": "cartesian_2d",
             "unit": "game_units",
@@ -261,16 +562,105 @@ def generate_map_file_from_features(country_name: str, features: List[Dict], out
             "trade_nodes": []
         }
     }
+    if centi_units:
+        # Center and bounds stay in game units; only the boundaries are integers
+        map_data["map_region"]["boundary_unit"] = "centi_game_units"
 
     # Write to file
     output_file = output_dir / f"map_{country_name}_real.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(map_data, f, indent=2, ensure_ascii=False)
+    write_json(output_file, map_data, compact)
 
     print(f"  Created {output_file.name} with {len(provinces)} provinces")
 
+def process_geojson_file(geojson_file: Path, data_dir: Path, compact: bool = False,
+                         simplify_tolerance: float = DEFAULT_SIMPLIFY_TOLERANCE,
+                         point_arrays: bool = False, centi_units: bool = False):
+    """Generate the map file for one country GeoJSON file."""
+    print(f"\nProcessing {geojson_file.name}")
+
+    country_data = read_json(geojson_file)
+
+    features = country_data.get('features', [])
+    if not features:
+        print(f"  WARNING: No features in {geojson_file.name}")
+        return
+
+    # Extract country name from filename (e.g., 'ukraine_nuts1.geojson' -> 'ukraine')
+    country_name = geojson_file.stem.replace('_nuts1', '')
+
+    # Map to country code (simple heuristic)
+    country_code_map = {
+        'ukraine': 'UA',
+        'belarus': 'BY',
+        'moldova': 'MD',
+        'russia': 'RU',
+        'united_kingdom': 'UK'
+    }
+    country_code = country_code_map.get(country_name, country_name[:2].upper())
+
+    print(f"  Found {len(features)} provinces for {country_name}")
+    generate_map_file_from_features(country_name, features, data_dir, compact,
+                                    simplify_tolerance, point_arrays, centi_units)
+
+def _run_captured(func: Callable, args: Tuple) -> str:
+    """Run func(*args) in a worker and return everything it printed."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        func(*args)
+    return output.getvalue()
+
+def run_jobs(func: Callable, jobs: List[Tuple], workers: int = None):
+    """
+    Run func(*job) for every job. Each job writes its own map file, so jobs
+    run in parallel worker processes; their output is printed in job order.
+    workers defaults to the CPU count, 1 runs everything in this process.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            func(*job)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        for output in executor.map(_run_captured, [func] * len(jobs), jobs):
+            print(output, end='')
+
 def main():
     """Main function to generate all map files."""
+    parser = argparse.ArgumentParser(description="Generate map files for European regions.")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write map files without indentation (faster, smaller, not diff-friendly)",
+    )
+    parser.add_argument(
+        "--simplify",
+        type=float,
+        default=DEFAULT_SIMPLIFY_TOLERANCE,
+        help=f"Boundary simplification tolerance in game units (default: {DEFAULT_SIMPLIFY_TOLERANCE}, 0 disables)",
+    )
+    parser.add_argument(
+        "--point-arrays",
+        action="store_true",
+        help="Store boundary points as [x, y] pairs instead of {\"x\", \"y\"} objects "
+             "(smaller, but not readable by the game's map loaders)",
+    )
+    parser.add_argument(
+        "--centi-units",
+        action="store_true",
+        help="Store boundary coordinates as integer hundredths of a game unit "
+             "(\"x_cu\"/\"y_cu\" keys, not readable by the game's map loaders)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes generating countries in parallel (default: CPU count, 1 disables)",
+    )
+    args = parser.parse_args()
+
     # Paths
     script_dir = Path(__file__).parent
     data_dir = script_dir / 'maps'
@@ -280,25 +670,30 @@ def main():
     combined_file = geojson_dir / 'europe_nuts1_2024.json'
     if combined_file.exists():
         print(f"Loading {combined_file}")
-        with open(combined_file, 'r', encoding='utf-8') as f:
-            nuts1_data = json.load(f)
 
-        # Group regions by country
+        # Group regions by country, keeping only the fields generate_map_file
+        # reads so the grouped regions stay small (they are also pickled to
+        # the worker processes)
         countries = {}
-        for feature in nuts1_data['features']:
-            region_id = feature['properties']['id']
-            country_code = region_id[:2]
+        for feature in iter_features(combined_file):
+            properties = feature['properties']
+            country_code = properties['id'][:2]
 
             if country_code not in countries:
                 countries[country_code] = []
-            countries[country_code].append(feature)
+            countries[country_code].append({
+                'properties': {'na': properties['na']},
+                'geometry': feature['geometry']
+            })
 
         # Generate map files for each country
         print(f"\nFound {len(countries)} countries")
         print(f"Generating map files...\n")
 
-        for country_code in sorted(countries.keys()):
-            generate_map_file(country_code, countries[country_code], data_dir)
+        jobs = [(country_code, countries[country_code], data_dir,
+                 args.compact, args.simplify, args.point_arrays, args.centi_units)
+                for country_code in sorted(countries.keys())]
+        run_jobs(generate_map_file, jobs, args.workers)
     else:
         # Use individual country GeoJSON files (new method)
         print(f"Looking for individual country GeoJSON files in {geojson_dir}")
@@ -311,32 +706,10 @@ def main():
 
         print(f"Found {len(geojson_files)} country files")
 
-        for geojson_file in sorted(geojson_files):
-            print(f"\nProcessing {geojson_file.name}")
-
-            with open(geojson_file, 'r', encoding='utf-8') as f:
-                country_data = json.load(f)
-
-            features = country_data.get('features', [])
-            if not features:
-                print(f"  WARNING: No features in {geojson_file.name}")
-                continue
-
-            # Extract country name from filename (e.g., 'ukraine_nuts1.geojson' -> 'ukraine')
-            country_name = geojson_file.stem.replace('_nuts1', '')
-
-            # Map to country code (simple heuristic)
-            country_code_map = {
-                'ukraine': 'UA',
-                'belarus': 'BY',
-                'moldova': 'MD',
-                'russia': 'RU',
-                'united_kingdom': 'UK'
-            }
-            country_code = country_code_map.get(country_name, country_name[:2].upper())
-
-            print(f"  Found {len(features)} provinces for {country_name}")
-            generate_map_file_from_features(country_name, features, data_dir)
+        jobs = [(geojson_file, data_dir, args.compact, args.simplify,
+                 args.point_arrays, args.centi_units)
+                for geojson_file in sorted(geojson_files)]
+        run_jobs(process_geojson_file, jobs, args.workers)
 
     print("\nDone!")
 
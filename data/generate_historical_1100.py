@@ -4,10 +4,18 @@ Generate game map files from 11th century historical GeoJSON data.
 Uses data from aourednik/historical-basemaps for year 1100 CE.
 """
 
-import json
+import argparse
+import math
+import re
+import sys
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+sys.path.insert(0, str(Path(__file__).parent))
+from generate_europe_maps import iter_features, write_json, write_map_streamed
+from map_projection import convert_ring
+
 # European bounding box (roughly)
 EUROPE_BOUNDS = {
     'min_lon': -25,
@@ -16,6 +24,11 @@ EUROPE_BOUNDS = {
     'max_lat': 75
 }
 
+# EUROPE_BOUNDS as (min_lon, max_lon, min_lat, max_lat), unpacked once per
+# feature by is_in_europe instead of four dict lookups
+EUROPE_BOX = (EUROPE_BOUNDS['min_lon'], EUROPE_BOUNDS['max_lon'],
+              EUROPE_BOUNDS['min_lat'], EUROPE_BOUNDS['max_lat'])
+
 # Map historical entity names to game-friendly IDs
 ENTITY_NAME_MAP = {
     'Kievan Rus': 'kievan_rus',
@@ -60,19 +73,47 @@ ENTITY_NAME_MAP = {
     'Cuman-Kipchak confederation': 'cumans'
 }
 
-def convert_coordinates(lon: float, lat: float) -> Dict[str, float]:
-    """
-    Convert lat/lon to game coordinates using equirectangular projection.
-    Same system as modern maps.
-    """
-    center_lon = 10.0
-    center_lat = 50.0
-    scale = 50.0
+# Name keywords checked in order; the first category with a matching keyword
+# wins. Each category's keywords are compiled into one alternation, so a name
+# is scanned once per category instead of once per keyword.
+TERRAIN_KEYWORDS = (
+    ('mountains', ('mountain', 'highland', 'alps')),
+    ('forest', ('forest', 'taiga')),
+    ('coast', ('coast', 'island', 'maritime')),
+    ('plains', ('steppe', 'plain', 'kipchak', 'cuman')),
+)
+RELIGION_KEYWORDS = (
+    ('orthodox', ('byzantine', 'rus', 'kiev', 'serbia', 'bulgaria', 'georgia')),
+    ('sunni', ('almoravid', 'seljuk', 'emirate')),
+    ('catholic', ('papal', 'holy roman')),
+    ('pagan', ('pagan', 'prussian', 'sami')),
+)
+
+def compile_keywords(categories: Tuple) -> List[Tuple[str, re.Pattern]]:
+    """Compile each category's keywords into a single regex alternation."""
+    return [(category, re.compile('|'.join(map(re.escape, keywords))))
+            for category, keywords in categories]
+
+TERRAIN_PATTERNS = compile_keywords(TERRAIN_KEYWORDS)
+RELIGION_PATTERNS = compile_keywords(RELIGION_KEYWORDS)
+
+def match_category(name: str, patterns: List[Tuple[str, re.Pattern]], default: str) -> str:
+    """First category whose keywords occur in the lowercased name, or default."""
+    name_lower = name.lower()
+    for category, pattern in patterns:
+        if pattern.search(name_lower):
+            return category
 
-    x = (lon - center_lon) * scale
-    y = (lat - center_lat) * scale
+    return default
 
-    return {"x": round(x, 2), "y": round(y, 2)}
+@lru_cache(maxsize=None)
+def entity_id_for_name(name: str) -> str:
+    """
+    Game ID of a historical entity name.
+    Cached per name: every feature of an entity shares one interned ID string,
+    which is then used as owner_realm and culture of all its provinces.
+    """
+    return sys.intern(ENTITY_NAME_MAP.get(name, name.lower().replace(' ', '_').replace('-', '_')))
 
 def is_in_europe(geometry: Dict) -> bool:
     """Check if geometry is in European bounds."""
@@ -93,19 +134,16 @@ def is_in_europe(geometry: Dict) -> bool:
         else:
             return False
 
-        return (EUROPE_BOUNDS['min_lon'] <= lon <= EUROPE_BOUNDS['max_lon'] and
-                EUROPE_BOUNDS['min_lat'] <= lat <= EUROPE_BOUNDS['max_lat'])
+        min_lon, max_lon, min_lat, max_lat = EUROPE_BOX
+        return min_lon <= lon <= max_lon and min_lat <= lat <= max_lat
     except (IndexError, TypeError, KeyError):
         return False
 
 def convert_geojson_polygon(coordinates: List) -> List[Dict[str, float]]:
     """Convert GeoJSON polygon coordinates to game format."""
-    converted = []
-
-    for lon, lat in coordinates:
-        converted.append(convert_coordinates(lon, lat))
-
-    return converted
+    # Same system as modern maps, but with y growing to the north
+    xs, ys = convert_ring(coordinates, invert_y=False)
+    return [{"x": x, "y": y} for x, y in zip(xs, ys)]
 
 def extract_main_polygon(geometry: Dict) -> List[Dict[str, float]]:
     """Extract the main polygon from GeoJSON geometry."""
@@ -116,23 +154,27 @@ def extract_main_polygon(geometry: Dict) -> List[Dict[str, float]]:
         # Use the outer ring (first ring)
         return convert_geojson_polygon(coords[0])
     elif geom_type == 'MultiPolygon':
-        # Use the largest polygon
-        polygons = []
-        for polygon in coords:
-            converted = convert_geojson_polygon(polygon[0])
-            polygons.append(converted)
-        # Return the longest (likely the main territory)
-        return max(polygons, key=len) if polygons else []
+        # Use the longest polygon (likely the main territory), picked on the
+        # raw positions so only that one is converted
+        if not coords:
+            return []
+        return convert_geojson_polygon(max(coords, key=lambda polygon: len(polygon[0]))[0])
 
     return []
 
 def calculate_center(boundary: List[Dict[str, float]]) -> Dict[str, float]:
-    """Calculate the centroid of a polygon."""
+    """
+    Calculate the center of a polygon as the mean of its vertices.
+    This is what every map generator and the existing map data use, so it is
+    kept over the area centroid; both sums are taken in a single pass.
+    """
     if not boundary:
         return {"x": 0.0, "y": 0.0}
 
-    x_sum = sum(point['x'] for point in boundary)
-    y_sum = sum(point['y'] for point in boundary)
+    x_sum = y_sum = 0.0
+    for point in boundary:
+        x_sum += point['x']
+        y_sum += point['y']
     n = len(boundary)
 
     return {
@@ -142,34 +184,12 @@ def calculate_center(boundary: List[Dict[str, float]]) -> Dict[str, float]:
 
 def determine_terrain(name: str, partof: str) -> str:
     """Determine terrain type based on entity name and location."""
-    name_lower = name.lower()
-
-    if any(x in name_lower for x in ['mountain', 'highland', 'alps']):
-        return 'mountains'
-    elif any(x in name_lower for x in ['forest', 'taiga']):
-        return 'forest'
-    elif any(x in name_lower for x in ['coast', 'island', 'maritime']):
-        return 'coast'
-    elif any(x in name_lower for x in ['steppe', 'plain', 'kipchak', 'cuman']):
-        return 'plains'
-    else:
-        return 'plains'
+    return match_category(name, TERRAIN_PATTERNS, 'plains')
 
 def determine_religion(name: str, partof: str) -> str:
     """Determine religion based on entity."""
-    name_lower = name.lower()
-
-    if any(x in name_lower for x in ['byzantine', 'rus', 'kiev', 'serbia', 'bulgaria', 'georgia']):
-        return 'orthodox'
-    elif any(x in name_lower for x in ['almoravid', 'seljuk', 'emirate']):
-        return 'sunni'
-    elif any(x in name_lower for x in ['papal', 'holy roman']):
-        return 'catholic'
-    elif 'pagan' in name_lower or 'prussian' in name_lower or 'sami' in name_lower:
-        return 'pagan'
-    else:
-        # Default for Western/Central Europe
-        return 'catholic'
+    # Default for Western/Central Europe
+    return match_category(name, RELIGION_PATTERNS, 'catholic')
 
 def create_province(province_id: int, feature: Dict, realm_id: str) -> Dict:
     """Create a province from a GeoJSON feature."""
@@ -209,34 +229,65 @@ def calculate_bounds(provinces: List[Dict]) -> Dict[str, float]:
     if not provinces:
         return {"min_x": 0, "max_x": 0, "min_y": 0, "max_y": 0}
 
-    all_x = []
-    all_y = []
-
+    # Reduce one province at a time so no map-wide coordinate list is built
+    min_x = min_y = math.inf
+    max_x = max_y = -math.inf
     for province in provinces:
-        for point in province['boundary']:
-            all_x.append(point['x'])
-            all_y.append(point['y'])
+        boundary = province['boundary']
+        if not boundary:
+            continue
+
+        xs = [point['x'] for point in boundary]
+        ys = [point['y'] for point in boundary]
+        min_x = min(min_x, min(xs))
+        max_x = max(max_x, max(xs))
+        min_y = min(min_y, min(ys))
+        max_y = max(max_y, max(ys))
+
+    return {
+        "min_x": round(min_x, 2),
+        "max_x": round(max_x, 2),
+        "min_y": round(min_y, 2),
+        "max_y": round(max_y, 2)
+    }
+
+def merge_bounds(boxes: List[Dict[str, float]]) -> Dict[str, float]:
+    """
+    Combine already calculated bounding boxes into one.
+    The combined map takes its bounds from the entity maps this way, instead
+    of walking every boundary a second time.
+    """
+    if not boxes:
+        return {"min_x": 0, "max_x": 0, "min_y": 0, "max_y": 0}
 
     return {
-        "min_x": round(min(all_x), 2),
-        "max_x": round(max(all_x), 2),
-        "min_y": round(min(all_y), 2),
-        "max_y": round(max(all_y), 2)
+        "min_x": min(box["min_x"] for box in boxes),
+        "max_x": max(box["max_x"] for box in boxes),
+        "min_y": min(box["min_y"] for box in boxes),
+        "max_y": max(box["max_y"] for box in boxes)
     }
 
-def generate_entity_maps(output_dir: Path):
+def generate_entity_maps(output_dir: Path, compact: bool = False):
     """Generate map files for all 11th century European entities."""
     # Load historical data
     historical_file = Path('data/maps/geojson_source/historical/world_1100.geojson')
 
+    # Features are streamed (with ijson if installed) and only the European
+    # ones are kept, grouped by entity for both this and the combined map
     print(f"Loading {historical_file}...")
-    with open(historical_file, 'r', encoding='utf-8') as f:
-        geojson_data = json.load(f)
 
     # Group features by entity
     entities = {}
 
-    for feature in geojson_data['features']:
+    for feature in iter_features(historical_file):
+        # Cheapest filters first: unnamed features are dropped before
+        # their geometry is looked at
+        props = feature.get('properties') or {}
+        name = props.get('NAME')
+
+        if not name or name == 'Unknown':
+            continue
+
         if not feature.get('geometry'):
             continue
 
@@ -244,14 +295,8 @@ def generate_entity_maps(output_dir: Path):
         if not is_in_europe(feature['geometry']):
             continue
 
-        props = feature['properties']
-        name = props.get('NAME')
-
-        if not name or name == 'Unknown':
-            continue
-
         # Get or create entity ID
-        entity_id = ENTITY_NAME_MAP.get(name, name.lower().replace(' ', '_').replace('-', '_'))
+        entity_id = entity_id_for_name(name)
 
         if entity_id not in entities:
             entities[entity_id] = {
@@ -264,7 +309,9 @@ def generate_entity_maps(output_dir: Path):
     print(f"\nFound {len(entities)} European entities in year 1100")
     print(f"\nGenerating map files...\n")
 
-    # Generate map for each entity
+    # Generate map for each entity, keeping its provinces and bounds for the combined map
+    provinces_by_entity = {}
+    bounds_by_entity = {}
     for entity_id, entity_data in sorted(entities.items()):
         provinces = []
         province_id = 100
@@ -275,11 +322,13 @@ def generate_entity_maps(output_dir: Path):
                 provinces.append(province)
                 province_id += 1
 
+        provinces_by_entity[entity_id] = provinces
         if not provinces:
             continue
 
         # Calculate bounds
         bounds = calculate_bounds(provinces)
+        bounds_by_entity[entity_id] = bounds
 
         # Create map data
         map_data = {
@@ -299,49 +348,45 @@ def generate_entity_maps(output_dir: Path):
 
         # Write to file
         output_file = output_dir / f"map_{entity_id}_1100.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(map_data, f, indent=2, ensure_ascii=False)
+        write_json(output_file, map_data, compact)
 
         print(f"  Created {output_file.name} with {len(provinces)} provinces")
 
-    return entities
+    return entities, provinces_by_entity, bounds_by_entity
 
-def generate_combined_historical_map(entities: Dict, output_dir: Path):
+def generate_combined_historical_map(entities: Dict, provinces_by_entity: Dict[str, List[Dict]],
+                                     bounds_by_entity: Dict[str, Dict[str, float]], output_dir: Path,
+                                     compact: bool = False):
     """Generate a combined map of all 11th century Europe."""
     print(f"\n\nGenerating combined historical Europe map...\n")
 
-    historical_file = Path('data/maps/geojson_source/historical/world_1100.geojson')
-
-    with open(historical_file, 'r', encoding='utf-8') as f:
-        geojson_data = json.load(f)
-
-    all_provinces = []
-    province_id = 100
-
-    for entity_id, entity_data in sorted(entities.items()):
-        for feature in entity_data['features']:
-            province = create_province(province_id, feature, entity_id)
-            if province:
-                all_provinces.append(province)
+    # The provinces were already built by generate_entity_maps; each one is
+    # copied with a map-wide ID, sharing its center and boundary, as it is written
+    def numbered_provinces():
+        province_id = 100
+        for entity_id in sorted(provinces_by_entity):
+            for province in provinces_by_entity[entity_id]:
+                yield dict(province, id=province_id)
                 province_id += 1
 
-    if not all_provinces:
+    province_count = sum(len(provinces) for provinces in provinces_by_entity.values())
+    if not province_count:
         print("No provinces found!")
         return
 
-    # Calculate bounds
-    bounds = calculate_bounds(all_provinces)
+    # Calculate bounds from the entity map bounds
+    bounds = merge_bounds(list(bounds_by_entity.values()))
 
     # Create combined map
     map_data = {
         "map_region": {
             "id": "europe_1100",
             "name": "Europe 1100 CE",
-            "description": f"Historical map of Europe in year 1100 CE with {len(entities)} polities and {len(all_provinces)} provinces",
+            "description": f"Historical map of Europe in year 1100 CE with {len(entities)} polities and {province_count} provinces",
             "coordinate_system": "cartesian_2d",
             "unit": "game_units",
             "bounds": bounds,
-            "provinces": all_provinces,
+            "provinces": [],  # Written one at a time from numbered_provinces
             "sea_zones": [],
             "trade_nodes": [],
             "historical_year": 1100
@@ -350,13 +395,20 @@ def generate_combined_historical_map(entities: Dict, output_dir: Path):
 
     # Write combined map
     output_file = output_dir / "map_europe_1100.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(map_data, f, indent=2, ensure_ascii=False)
+    write_map_streamed(output_file, map_data, numbered_provinces(), compact)
 
-    print(f"Created {output_file.name} with {len(all_provinces)} provinces from {len(entities)} polities")
+    print(f"Created {output_file.name} with {province_count} provinces from {len(entities)} polities")
 
 def main():
     """Main function to generate all historical maps."""
+    parser = argparse.ArgumentParser(description="Generate game map files from 11th century historical GeoJSON data.")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write map files without indentation (smaller, not diff-friendly)",
+    )
+    args = parser.parse_args()
+
     script_dir = Path(__file__).parent
     output_dir = script_dir / 'data' / 'maps' / 'historical_1100'
     output_dir.mkdir(exist_ok=True)
@@ -367,10 +419,11 @@ def main():
     print(f"\nOutput directory: {output_dir}\n")
 
     # Generate individual entity maps
-    entities = generate_entity_maps(output_dir)
+    entities, provinces_by_entity, bounds_by_entity = generate_entity_maps(output_dir, args.compact)
 
     # Generate combined map
-    generate_combined_historical_map(entities, output_dir)
+    generate_combined_historical_map(entities, provinces_by_entity, bounds_by_entity, output_dir,
+                                     args.compact)
 
     print("\n" + "="*70)
     print("HISTORICAL MAP GENERATION COMPLETE!")
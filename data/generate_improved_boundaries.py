@@ -4,11 +4,18 @@ Generate improved polygon boundaries for Eastern European countries.
 Uses approximate real geographic positions to create better-looking provinces.
 """
 
-import json
+import argparse
 import math
+import sys
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Tuple
 
+# Reuse the parallel job runner from the NUTS1 map generator
+sys.path.insert(0, str(Path(__file__).parent))
+from generate_europe_maps import extend_bounds, run_jobs, write_json
+from map_projection import convert_points
+
 # Approximate center coordinates (longitude, latitude) for provinces
 # These are rough approximations based on real geography
 PROVINCE_CENTERS = {
@@ -53,28 +60,13 @@ PROVINCE_SIZES = {
     "russia_european": (5.0, 4.0),
 }
 
-def convert_coordinates(lon: float, lat: float) -> Dict[str, float]:
-    """Convert lat/lon to game coordinates matching existing map."""
-    # Center point approximately in central Europe (10°E, 50°N)
-    center_lon = 10.0
-    center_lat = 50.0
-
-    # Scale factor to convert degrees to game units
-    scale = 50.0
-
-    x = (lon - center_lon) * scale
-    y = (lat - center_lat) * scale
-
-    return {"x": round(x, 2), "y": round(y, 2)}
-
-def generate_irregular_polygon(center_lon: float, center_lat: float,
-                               width: float, height: float,
-                               num_points: int = 40) -> List[Dict[str, float]]:
+@lru_cache(maxsize=None)
+def polygon_outline(num_points: int) -> Tuple[Tuple[float, float, float], ...]:
     """
-    Generate an irregular polygon around a center point.
-    Creates a more natural-looking shape than a perfect rectangle.
+    (variation, cos, sin) of every outline angle of an irregular polygon.
+    Depends only on num_points, so it is computed once and shared.
     """
-    points = []
+    outline = []
 
     for i in range(num_points):
         angle = (2 * math.pi * i) / num_points
@@ -83,51 +75,76 @@ def generate_irregular_polygon(center_lon: float, center_lat: float,
         # Use deterministic "random" based on angle for consistency
         variation = 0.85 + 0.3 * math.sin(angle * 3.7) * math.cos(angle * 2.3)
 
-        # Calculate point position
-        radius_x = (width / 2) * variation
-        radius_y = (height / 2) * variation
+        outline.append((variation, math.cos(angle), math.sin(angle)))
+
+    return tuple(outline)
+
+@lru_cache(maxsize=None)
+def polygon_offsets(width: float, height: float,
+                    num_points: int) -> Tuple[Tuple[float, ...], Tuple[float, ...]]:
+    """Lon and lat offsets of an irregular polygon's points from its center."""
+    half_width = width / 2
+    half_height = height / 2
+    outline = polygon_outline(num_points)
+
+    lon_offsets = tuple((half_width * variation) * cos_a for variation, cos_a, _ in outline)
+    lat_offsets = tuple((half_height * variation) * sin_a for variation, _, sin_a in outline)
+    return lon_offsets, lat_offsets
+
+def irregular_polygon_coords(center_lon: float, center_lat: float,
+                             width: float, height: float,
+                             num_points: int = 40) -> Tuple[List[float], List[float]]:
+    """
+    Generate an irregular polygon around a center point as closed x and y lists.
+    Creates a more natural-looking shape than a perfect rectangle.
+    """
+    # Provinces of one country share a size, so only the center shift is per province
+    lon_offsets, lat_offsets = polygon_offsets(width, height, num_points)
 
-        lon = center_lon + radius_x * math.cos(angle)
-        lat = center_lat + radius_y * math.sin(angle)
+    lons = [center_lon + offset for offset in lon_offsets]
+    lats = [center_lat + offset for offset in lat_offsets]
 
-        point = convert_coordinates(lon, lat)
-        points.append(point)
+    # These maps keep y growing to the north (not inverted like the NUTS1 maps)
+    xs, ys = convert_points(lons, lats, invert_y=False)
 
     # Close the polygon
-    if points:
-        points.append(points[0])
+    if xs:
+        xs.append(xs[0])
+        ys.append(ys[0])
 
-    return points
+    return xs, ys
 
-def calculate_center(boundary: List[Dict[str, float]]) -> Dict[str, float]:
-    """Calculate the centroid of a polygon."""
-    if not boundary:
+def coords_center(xs: List[float], ys: List[float]) -> Dict[str, float]:
+    """Calculate the centroid of a closed polygon given as x and y lists."""
+    if not xs:
         return {"x": 0.0, "y": 0.0}
 
-    x_sum = sum(point['x'] for point in boundary)
-    y_sum = sum(point['y'] for point in boundary)
-    n = len(boundary) - 1  # Subtract 1 because last point duplicates first
+    # Leave out the closing point, which duplicates the first
+    n = len(xs) - 1
 
     return {
-        "x": round(x_sum / n, 2),
-        "y": round(y_sum / n, 2)
+        "x": round(sum(xs[:n]) / n, 2),
+        "y": round(sum(ys[:n]) / n, 2)
     }
 
 def generate_country_map(country_name: str, province_data: Dict, size: Tuple[float, float]) -> Dict:
     """Generate a complete map file for a country."""
     provinces = []
+    bounds = None
     province_id = 1
 
     for province_name, (center_lon, center_lat) in province_data.items():
-        # Generate irregular polygon
-        boundary = generate_irregular_polygon(
+        # Generate irregular polygon; center and bounds come from the x/y
+        # lists, the point dicts are only built for the output
+        xs, ys = irregular_polygon_coords(
             center_lon, center_lat,
             size[0], size[1],
             num_points=40
         )
+        boundary = [{"x": x, "y": y} for x, y in zip(xs, ys)]
 
         # Calculate center
-        center = calculate_center(boundary)
+        center = coords_center(xs, ys)
 
         # Create province data
         province = {
@@ -141,23 +158,9 @@ def generate_country_map(country_name: str, province_data: Dict, size: Tuple[flo
         }
 
         provinces.append(province)
+        bounds = extend_bounds(bounds, xs, ys)
         province_id += 1
 
-    # Calculate bounding box
-    all_x = []
-    all_y = []
-    for prov in provinces:
-        for point in prov['boundary']:
-            all_x.append(point['x'])
-            all_y.append(point['y'])
-
-    bounds = {
-        "min_x": round(min(all_x), 2),
-        "max_x": round(max(all_x), 2),
-        "min_y": round(min(all_y), 2),
-        "max_y": round(max(all_y), 2)
-    }
-
     # Create map structure
     map_data = {
         "map_region": {
@@ -172,28 +175,47 @@ def generate_country_map(country_name: str, province_data: Dict, size: Tuple[flo
 
     return map_data
 
+def write_country_map(country_name: str, province_data: Dict, maps_dir: Path,
+                      compact: bool = False):
+    """Generate one country's map and write it to maps_dir."""
+    size = PROVINCE_SIZES[country_name]
+
+    print(f"Generating {country_name}...")
+    print(f"  Provinces: {len(province_data)}")
+    print(f"  Points per province: ~40")
+
+    map_data = generate_country_map(country_name, province_data, size)
+
+    # Write to file
+    output_file = maps_dir / f"map_{country_name}_real.json"
+    write_json(output_file, map_data, compact)
+
+    print(f"  ✓ Saved to {output_file.name}\n")
+
 def main():
     """Generate improved map files for Eastern European countries."""
+    parser = argparse.ArgumentParser(description="Generate improved boundaries for Eastern European countries.")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write map files without indentation (smaller, not diff-friendly)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes generating countries in parallel (default: CPU count, 1 disables)",
+    )
+    args = parser.parse_args()
+
     script_dir = Path(__file__).parent
     maps_dir = script_dir / 'maps'
 
     print("Generating improved boundary data for Eastern European countries...\n")
 
-    for country_name, province_data in PROVINCE_CENTERS.items():
-        size = PROVINCE_SIZES[country_name]
-
-        print(f"Generating {country_name}...")
-        print(f"  Provinces: {len(province_data)}")
-        print(f"  Points per province: ~40")
-
-        map_data = generate_country_map(country_name, province_data, size)
-
-        # Write to file
-        output_file = maps_dir / f"map_{country_name}_real.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(map_data, f, indent=2, ensure_ascii=False)
-
-        print(f"  ✓ Saved to {output_file.name}\n")
+    jobs = [(country_name, province_data, maps_dir, args.compact)
+            for country_name, province_data in PROVINCE_CENTERS.items()]
+    run_jobs(write_country_map, jobs, args.workers)
 
     print("✓ All country maps generated successfully!")
     print("\nNext step: Run update_combined_europe.py to merge into combined map")
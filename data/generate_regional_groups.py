@@ -3,11 +3,16 @@
 Generate regional grouping map files by combining individual country maps.
 """
 
-import json
+import argparse
+import math
 import os
+import sys
 from pathlib import Path
 from typing import Dict, List
 
+sys.path.insert(0, str(Path(__file__).parent))
+from generate_europe_maps import read_json, run_jobs, write_json
+
 # Regional groupings
 REGIONS = {
     'northern_europe': {
@@ -46,30 +51,36 @@ def load_country_map(country_name: str, maps_dir: Path) -> Dict:
         print(f"Warning: {map_file} not found")
         return None
 
-    with open(map_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_json(map_file)
 
 def calculate_combined_bounds(all_provinces: List[Dict]) -> Dict[str, float]:
     """Calculate bounding box for all provinces."""
     if not all_provinces:
         return {"min_x": 0, "max_x": 0, "min_y": 0, "max_y": 0}
 
-    all_x = []
-    all_y = []
-
+    # Reduce one province at a time so no map-wide coordinate list is built
+    min_x = min_y = math.inf
+    max_x = max_y = -math.inf
     for province in all_provinces:
-        for point in province['boundary']:
-            all_x.append(point['x'])
-            all_y.append(point['y'])
+        boundary = province['boundary']
+        if not boundary:
+            continue
+
+        xs = [point['x'] for point in boundary]
+        ys = [point['y'] for point in boundary]
+        min_x = min(min_x, min(xs))
+        max_x = max(max_x, max(xs))
+        min_y = min(min_y, min(ys))
+        max_y = max(max_y, max(ys))
 
     return {
-        "min_x": round(min(all_x), 2),
-        "max_x": round(max(all_x), 2),
-        "min_y": round(min(all_y), 2),
-        "max_y": round(max(all_y), 2)
+        "min_x": round(min_x, 2),
+        "max_x": round(max_x, 2),
+        "min_y": round(min_y, 2),
+        "max_y": round(max_y, 2)
     }
 
-def generate_regional_map(region_id: str, region_info: Dict, maps_dir: Path):
+def generate_regional_map(region_id: str, region_info: Dict, maps_dir: Path, compact: bool = False):
     """Generate a regional map file by combining country maps."""
     print(f"\nGenerating {region_id}...")
 
@@ -112,20 +123,34 @@ def generate_regional_map(region_id: str, region_info: Dict, maps_dir: Path):
 
     # Write to file
     output_file = maps_dir / f"map_{region_id}.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(map_data, f, indent=2, ensure_ascii=False)
+    write_json(output_file, map_data, compact)
 
     print(f"Created {output_file.name} with {len(all_provinces)} provinces")
 
 def main():
     """Main function to generate all regional grouping files."""
+    parser = argparse.ArgumentParser(description="Generate regional grouping map files from country maps.")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write map files without indentation (smaller, not diff-friendly)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes generating regions in parallel (default: CPU count, 1 disables)",
+    )
+    args = parser.parse_args()
+
     script_dir = Path(__file__).parent
     maps_dir = script_dir / 'data' / 'maps'
 
     print("Generating regional grouping files...\n")
 
-    for region_id, region_info in REGIONS.items():
-        generate_regional_map(region_id, region_info, maps_dir)
+    # Regions read their own country files and write their own map file
+    jobs = [(region_id, region_info, maps_dir, args.compact) for region_id, region_info in REGIONS.items()]
+    run_jobs(generate_regional_map, jobs, args.workers)
 
     print("\nDone!")
 
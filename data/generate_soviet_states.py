@@ -4,10 +4,16 @@ Generate map files for former Soviet states in Europe.
 Since NUTS1 data doesn't cover these, we'll create basic regional maps.
 """
 
-import json
+import argparse
+import sys
 from pathlib import Path
 from typing import Dict, List
 
+# Reuse the parallel job runner from the NUTS1 map generator
+sys.path.insert(0, str(Path(__file__).parent))
+from generate_europe_maps import extend_bounds, run_jobs, write_json
+from map_projection import convert_coordinates, convert_points
+
 # Major regions for former Soviet states
 # Using simplified regional divisions
 FORMER_SOVIET_REGIONS = {
@@ -56,95 +62,76 @@ FORMER_SOVIET_REGIONS = {
     }
 }
 
-def convert_coordinates(lon: float, lat: float) -> Dict[str, float]:
-    """Convert lat/lon to game coordinates using the same system as NUTS1."""
-    center_lon = 10.0
-    center_lat = 50.0
-    scale = 50.0
-
-    x = (lon - center_lon) * scale
-    y = (lat - center_lat) * scale
+# Shared province defaults in output key order; None fields are set per province
+PROVINCE_TEMPLATE = {
+    "id": None,
+    "name": None,
+    "owner_realm": None,
+    "terrain_type": "plains",
+    "center": None,
+    "base_tax": 5,
+    "base_production": 5,
+    "base_manpower": 5,
+    "development": 15,
+    "boundary": None,
+    "features": None,
+    "trade_goods": "grain",
+    "culture": None,
+    "religion": "orthodox",
+    "climate": "continental"
+}
 
-    return {"x": round(x, 2), "y": round(y, 2)}
+# Corners of the placeholder province rectangle, scaled by its size in degrees
+RECTANGLE_CORNERS = (
+    (-1, -1),
+    (1, -1),
+    (1, 1),
+    (-1, 1),
+    (-1, -1)  # Close the polygon
+)
 
 def create_approximate_boundary(center_lat: float, center_lon: float, size: float = 2.0) -> List[Dict[str, float]]:
     """Create an approximate rectangular boundary around a center point."""
-    # Create a simple rectangle
-    points = []
-    offsets = [
-        (-size, -size),
-        (size, -size),
-        (size, size),
-        (-size, size),
-        (-size, -size)  # Close the polygon
-    ]
-
-    for lon_offset, lat_offset in offsets:
-        coords = convert_coordinates(center_lon + lon_offset, center_lat + lat_offset)
-        points.append(coords)
-
-    return points
+    xs, ys = convert_points([center_lon + size * corner_lon for corner_lon, _ in RECTANGLE_CORNERS],
+                            [center_lat + size * corner_lat for _, corner_lat in RECTANGLE_CORNERS],
+                            invert_y=False)
+
+    return [{"x": x, "y": y} for x, y in zip(xs, ys)]
 
 def create_province(region_id: int, region_data: Dict, country_name: str) -> Dict:
     """Create a province data structure."""
-    center = convert_coordinates(region_data['center_lon'], region_data['center_lat'])
+    center = convert_coordinates(region_data['center_lon'], region_data['center_lat'], invert_y=False)
     boundary = create_approximate_boundary(region_data['center_lat'], region_data['center_lon'])
 
-    return {
-        "id": region_id,
-        "name": region_data['name'],
-        "owner_realm": country_name,
-        "terrain_type": "plains",
-        "center": center,
-        "base_tax": 5,
-        "base_production": 5,
-        "base_manpower": 5,
-        "development": 15,
-        "boundary": boundary,
-        "features": [],
-        "trade_goods": "grain",
-        "culture": country_name,
-        "religion": "orthodox",
-        "climate": "continental"
-    }
-
-def calculate_bounds(provinces: List[Dict]) -> Dict[str, float]:
-    """Calculate bounding box for all provinces."""
-    if not provinces:
-        return {"min_x": 0, "max_x": 0, "min_y": 0, "max_y": 0}
-
-    all_x = []
-    all_y = []
-
-    for province in provinces:
-        for point in province['boundary']:
-            all_x.append(point['x'])
-            all_y.append(point['y'])
-
-    return {
-        "min_x": round(min(all_x), 2),
-        "max_x": round(max(all_x), 2),
-        "min_y": round(min(all_y), 2),
-        "max_y": round(max(all_y), 2)
-    }
-
-def generate_country_map(country_id: str, country_data: Dict, output_dir: Path):
+    province = PROVINCE_TEMPLATE.copy()
+    province["id"] = region_id
+    province["name"] = region_data['name']
+    province["owner_realm"] = country_name
+    province["center"] = center
+    province["boundary"] = boundary
+    province["features"] = []
+    province["culture"] = country_name
+    return province
+
+def generate_country_map(country_id: str, country_data: Dict, output_dir: Path,
+                         compact: bool = False):
     """Generate a map file for a country."""
     provinces = []
+    bounds = None
     province_id = 100
 
     for region in country_data['regions']:
         province = create_province(province_id, region, country_id)
         provinces.append(province)
+        boundary = province['boundary']
+        bounds = extend_bounds(bounds, [point['x'] for point in boundary],
+                               [point['y'] for point in boundary])
         province_id += 1
 
     if not provinces:
         print(f"No provinces found for {country_id}")
         return
 
-    # Calculate bounds
-    bounds = calculate_bounds(provinces)
-
     # Create map data structure
     map_data = {
         "map_region": {
@@ -162,20 +149,34 @@ def generate_country_map(country_id: str, country_data: Dict, output_dir: Path):
 
     # Write to file
     output_file = output_dir / f"map_{country_id}_real.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(map_data, f, indent=2, ensure_ascii=False)
+    write_json(output_file, map_data, compact)
 
     print(f"Created {output_file.name} with {len(provinces)} provinces")
 
 def main():
     """Main function to generate all former Soviet state maps."""
+    parser = argparse.ArgumentParser(description="Generate map files for former Soviet states in Europe.")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write map files without indentation (smaller, not diff-friendly)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes generating countries in parallel (default: CPU count, 1 disables)",
+    )
+    args = parser.parse_args()
+
     script_dir = Path(__file__).parent
     data_dir = script_dir / 'data' / 'maps'
 
     print("Generating maps for former Soviet states in Europe...\n")
 
-    for country_id, country_data in FORMER_SOVIET_REGIONS.items():
-        generate_country_map(country_id, country_data, data_dir)
+    jobs = [(country_id, country_data, data_dir, args.compact)
+            for country_id, country_data in FORMER_SOVIET_REGIONS.items()]
+    run_jobs(generate_country_map, jobs, args.workers)
 
     print("\nDone!")
 
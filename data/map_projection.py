@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Equirectangular projection from lon/lat to game coordinates.
+Shared by the map generation scripts so every map uses the same origin and scale.
+"""
+
+from typing import Dict, List, Tuple
+
+# Projection: center point approximately in central Europe (10°E, 50°N)
+PROJECTION_CENTER_LON = 10.0
+PROJECTION_CENTER_LAT = 50.0
+
+# Scale factor to convert degrees to game units
+# Adjust this to match the scale of existing maps
+PROJECTION_SCALE = 50.0
+
+def convert_coordinates(lon: float, lat: float, invert_y: bool = True) -> Dict[str, float]:
+    """
+    Convert lat/lon to game coordinates.
+    With invert_y (the NUTS1 maps) higher latitude gives a lower y, because
+    game rendering has Y+ pointing down; without it y grows to the north.
+    """
+    x = (lon - PROJECTION_CENTER_LON) * PROJECTION_SCALE
+    y = (lat - PROJECTION_CENTER_LAT) * PROJECTION_SCALE
+    if invert_y:
+        y = -y
+
+    return {"x": round(x, 2), "y": round(y, 2)}
+
+def convert_points(lons: List[float], lats: List[float],
+                   invert_y: bool = True) -> Tuple[List[float], List[float]]:
+    """
+    Convert parallel lon/lat lists to game coordinates in one pass.
+    Same projection as convert_coordinates, returned as separate x and y
+    lists so no per-vertex dict is built until the boundary is emitted.
+    """
+    # Bind the projection constants once; the comprehensions read them as
+    # closure variables instead of looking up module globals per vertex
+    center_lon = PROJECTION_CENTER_LON
+    center_lat = PROJECTION_CENTER_LAT
+    scale = PROJECTION_SCALE
+
+    xs = [round((lon - center_lon) * scale, 2) for lon in lons]
+    if invert_y:
+        ys = [round(-(lat - center_lat) * scale, 2) for lat in lats]
+    else:
+        ys = [round((lat - center_lat) * scale, 2) for lat in lats]
+    return xs, ys
+
+def convert_ring(ring: List[List[float]], invert_y: bool = True) -> Tuple[List[float], List[float]]:
+    """Convert a whole ring of [lon, lat] positions to x and y lists (see convert_points)."""
+    return convert_points([position[0] for position in ring], [position[1] for position in ring], invert_y)
@@ -3,9 +3,16 @@
 Update the combined Europe map to include all European countries.
 """
 
-import json
+import argparse
+import struct
+import sys
+from array import array
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+# Map files are parsed and written with orjson when it is installed
+sys.path.insert(0, str(Path(__file__).parent))
+from generate_europe_maps import CENTI_UNITS_PER_UNIT, extend_bounds, read_json, write_json
 
 # All European countries to include (west of Ural Mountains)
 ALL_EUROPEAN_COUNTRIES = [
@@ -34,6 +41,19 @@ ALL_EUROPEAN_COUNTRIES = [
     'tr'
 ]
 
+# Per-country index written next to the combined map with --manifest
+MANIFEST_FILE = 'map_europe_manifest.json'
+
+# Binary boundary file written next to the combined map with --boundary-sidecar:
+# a header (magic, version, province count), a (province_id, offset, length)
+# table, then every boundary as little-endian int32 x, y pairs in hundredths
+# of a game unit. offset is in bytes from the start of the file, length in points.
+BOUNDARY_SIDECAR_FILE = 'map_europe_combined.bin'
+BOUNDARY_SIDECAR_MAGIC = b'MBND'
+BOUNDARY_SIDECAR_VERSION = 1
+BOUNDARY_SIDECAR_HEADER = struct.Struct('<4sII')
+BOUNDARY_SIDECAR_ENTRY = struct.Struct('<iII')
+
 def load_country_map(country_name: str, maps_dir: Path) -> Dict:
     """Load a country map file."""
     map_file = maps_dir / f"map_{country_name}_real.json"
@@ -41,39 +61,88 @@ def load_country_map(country_name: str, maps_dir: Path) -> Dict:
         print(f"Warning: {map_file} not found, skipping...")
         return None
 
-    with open(map_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-def calculate_combined_bounds(all_provinces: List[Dict]) -> Dict[str, float]:
-    """Calculate bounding box for all provinces."""
-    if not all_provinces:
-        return {"min_x": 0, "max_x": 0, "min_y": 0, "max_y": 0}
+    return read_json(map_file)
 
-    all_x = []
-    all_y = []
-
-    for province in all_provinces:
-        for point in province['boundary']:
-            all_x.append(point['x'])
-            all_y.append(point['y'])
+def union_bounds(bounds: Optional[Dict[str, float]], other: Dict[str, float]) -> Dict[str, float]:
+    """Smallest bounding box covering both boxes (bounds may be None)."""
+    if bounds is None:
+        return other
 
     return {
-        "min_x": round(min(all_x), 2),
-        "max_x": round(max(all_x), 2),
-        "min_y": round(min(all_y), 2),
-        "max_y": round(max(all_y), 2)
+        "min_x": min(bounds["min_x"], other["min_x"]),
+        "max_x": max(bounds["max_x"], other["max_x"]),
+        "min_y": min(bounds["min_y"], other["min_y"]),
+        "max_y": max(bounds["max_y"], other["max_y"])
     }
 
+def write_boundary_sidecar(sidecar_file: Path, provinces: List[Dict]):
+    """
+    Move the province boundaries into a binary sidecar file.
+    Each province's "boundary" is replaced in place by a "boundary_ref"
+    holding the offset and length of its points in sidecar_file.
+    """
+    offset = BOUNDARY_SIDECAR_HEADER.size + BOUNDARY_SIDECAR_ENTRY.size * len(provinces)
+    table = bytearray(BOUNDARY_SIDECAR_HEADER.pack(BOUNDARY_SIDECAR_MAGIC, BOUNDARY_SIDECAR_VERSION,
+                                                   len(provinces)))
+    points = array('i')
+
+    for index, province in enumerate(provinces):
+        boundary = province['boundary']
+        for point in boundary:
+            points.append(round(point['x'] * CENTI_UNITS_PER_UNIT))
+            points.append(round(point['y'] * CENTI_UNITS_PER_UNIT))
+
+        boundary_ref = {"offset": offset, "length": len(boundary)}
+        table += BOUNDARY_SIDECAR_ENTRY.pack(province['id'], offset, len(boundary))
+        offset += 2 * points.itemsize * len(boundary)
+
+        # Put the reference where "boundary" was so the key order is unchanged
+        province_with_ref = {}
+        for key, value in province.items():
+            if key == 'boundary':
+                province_with_ref['boundary_ref'] = boundary_ref
+            else:
+                province_with_ref[key] = value
+        provinces[index] = province_with_ref
+
+    if sys.byteorder != 'little':
+        points.byteswap()
+
+    with open(sidecar_file, 'wb') as f:
+        f.write(table)
+        f.write(points.tobytes())
+
 def main():
     """Main function to update the combined Europe map."""
+    parser = argparse.ArgumentParser(description="Merge country map files into map_europe_combined.json.")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write the combined map without indentation (much faster and smaller, not diff-friendly)",
+    )
+    parser.add_argument(
+        "--manifest",
+        action="store_true",
+        help=f"Also write maps/{MANIFEST_FILE} listing each country file with its bounds",
+    )
+    parser.add_argument(
+        "--boundary-sidecar",
+        action="store_true",
+        help=f"Store province boundaries in maps/{BOUNDARY_SIDECAR_FILE} and reference them "
+             "from the combined map (not readable by the game's map loaders)",
+    )
+    args = parser.parse_args()
+
     script_dir = Path(__file__).parent
     maps_dir = script_dir / 'maps'  # Changed from 'data/maps' to just 'maps'
 
     print("Updating combined Europe map...\n")
 
     all_provinces = []
+    bounds = None
     province_id = 100
     countries_included = []
+    manifest_countries = []
 
     for country_name in ALL_EUROPEAN_COUNTRIES:
         country_map = load_country_map(country_name, maps_dir)
@@ -82,11 +151,27 @@ def main():
 
         # Extract provinces and renumber them
         num_provinces = len(country_map['map_region']['provinces'])
+        first_province_id = province_id
+        country_bounds = None
         for province in country_map['map_region']['provinces']:
             province['id'] = province_id
             all_provinces.append(province)
+            boundary = province['boundary']
+            if boundary:
+                country_bounds = extend_bounds(country_bounds, [point['x'] for point in boundary],
+                                               [point['y'] for point in boundary])
             province_id += 1
 
+        if country_bounds is not None:
+            bounds = union_bounds(bounds, country_bounds)
+            manifest_countries.append({
+                "name": country_name,
+                "file": f"map_{country_name}_real.json",
+                "bounds": country_bounds,
+                "first_province_id": first_province_id,
+                "province_count": num_provinces
+            })
+
         countries_included.append(country_name)
         print(f"  Added {num_provinces} provinces from {country_name}")
 
@@ -94,9 +179,6 @@ def main():
         print("No provinces found!")
         return
 
-    # Calculate combined bounds
-    bounds = calculate_combined_bounds(all_provinces)
-
     # Create combined map data
     map_data = {
         "map_region": {
@@ -112,13 +194,34 @@ def main():
         }
     }
 
+    if args.boundary_sidecar:
+        # Bounds above were taken from the float boundaries before they move out
+        sidecar_file = maps_dir / BOUNDARY_SIDECAR_FILE
+        write_boundary_sidecar(sidecar_file, all_provinces)
+        map_data["map_region"]["boundary_file"] = sidecar_file.name
+        print(f"Wrote {len(all_provinces)} province boundaries to {sidecar_file.name}")
+
     # Write to file
     output_file = maps_dir / "map_europe_combined.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(map_data, f, indent=2, ensure_ascii=False)
+    write_json(output_file, map_data, args.compact)
 
     print(f"\nUpdated {output_file.name} with {len(all_provinces)} provinces from {len(countries_included)} countries")
     print(f"Countries included: {', '.join(sorted(countries_included))}")
 
+    if args.manifest:
+        # Per-country bounds and province id ranges, so a reader can pick
+        # country files without parsing the combined map
+        manifest = {
+            "id": "europe_combined",
+            "combined_file": output_file.name,
+            "coordinate_system": "cartesian_2d",
+            "unit": "game_units",
+            "bounds": bounds,
+            "countries": manifest_countries
+        }
+        manifest_file = maps_dir / MANIFEST_FILE
+        write_json(manifest_file, manifest, args.compact)
+        print(f"Wrote {manifest_file.name} with {len(manifest_countries)} countries")
+
 if __name__ == '__main__':
     main()
@@ -8,18 +8,29 @@ This script:
 3. Recalculates adjacencies including cross-border neighbors
 """
 
-import json
+import argparse
+import math
+import os
+import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 # Import adjacency calculation functions
 sys.path.insert(0, str(Path(__file__).parent))
 from calculate_adjacencies import (
     calculate_adaptive_tolerance,
-    are_neighbors,
-    calculate_border_length
+    calculate_border_lengths_shapely,
+    calculate_bounding_box,
+    coords_bounding_box,
+    coords_to_edges,
+    find_candidate_pairs,
+    map_coords,
+    measure_pairs_parallel,
+    pair_border_length
 )
+from generate_europe_maps import read_json, write_json
 
 # All European countries to include (west of Ural Mountains)
 ALL_EUROPEAN_COUNTRIES = [
@@ -48,6 +59,15 @@ ALL_EUROPEAN_COUNTRIES = [
     'united_kingdom',
 ]
 
+# Country maps are read and parsed by this many threads at once
+LOAD_WORKERS = 8
+
+# Candidate pair counts below this are measured in-process. A worker pool
+# costs about 35 ms to start on the combined map and a pair about 0.04 ms to
+# measure, so two workers only win from roughly 2000 pairs; the current map
+# has fewer than 300.
+PARALLEL_MIN_PAIRS = 2000
+
 def load_country_map(country_name: str, maps_dir: Path) -> Dict:
     """Load a country map file."""
     map_file = maps_dir / f"map_{country_name}_real.json"
@@ -56,73 +76,162 @@ def load_country_map(country_name: str, maps_dir: Path) -> Dict:
         return None
 
     try:
-        with open(map_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_json(map_file)
     except Exception as e:
         print(f"  Error loading {map_file.name}: {e}")
         return None
 
-def calculate_combined_bounds(all_provinces: List[Dict]) -> Dict[str, float]:
-    """Calculate bounding box for all provinces."""
+def country_known_pairs(provinces: List[Dict], first_index: int) -> Dict[Tuple[int, int], float]:
+    """
+    Border lengths of every province pair inside one country, taken from the
+    neighbors the country map already stores (see calculate_adjacencies.py).
+    provinces must still carry the country's own IDs; first_index is the
+    position of the first of them in the combined province list. Returns
+    {(i, j): border_length} for i < j, with 0.0 for pairs that are not
+    neighbors, or {} if any province has no stored neighbors.
+    """
+    if not all('neighbors' in province for province in provinces):
+        return {}
+
+    index_by_id = {province['id']: first_index + k for k, province in enumerate(provinces)}
+    known = {}
+    for k, province in enumerate(provinces):
+        i = first_index + k
+        for j in range(i + 1, first_index + len(provinces)):
+            known[(i, j)] = 0.0
+        for neighbor in province['neighbors']:
+            j = index_by_id.get(neighbor['id'])
+            if j is not None and i < j:
+                known[(i, j)] = neighbor['border_length']
+
+    return known
+
+def calculate_combined_bounds(all_provinces: List[Dict], bboxes: List[Dict] = None) -> Dict[str, float]:
+    """
+    Calculate bounding box for all provinces.
+    Pass the per-province bboxes (coords_bounding_box) if they were already
+    computed; the map bounds are then reduced from them without touching
+    the boundary points again.
+    """
     if not all_provinces:
         return {"min_x": 0, "max_x": 0, "min_y": 0, "max_y": 0}
 
-    all_x = []
-    all_y = []
+    if bboxes is None:
+        bboxes = [calculate_bounding_box(province.get('boundary', [])) for province in all_provinces]
 
-    for province in all_provinces:
-        for point in province.get('boundary', []):
-            all_x.append(point['x'])
-            all_y.append(point['y'])
+    # Reduce one province box at a time so no map-wide coordinate list is built
+    min_x = min_y = math.inf
+    max_x = max_y = -math.inf
+    for province, bbox in zip(all_provinces, bboxes):
+        if not province.get('boundary'):
+            continue
 
-    if not all_x:
+        min_x = min(min_x, bbox['min_x'])
+        max_x = max(max_x, bbox['max_x'])
+        min_y = min(min_y, bbox['min_y'])
+        max_y = max(max_y, bbox['max_y'])
+
+    if min_x == math.inf:
         return {"min_x": 0, "max_x": 0, "min_y": 0, "max_y": 0}
 
     return {
-        "min_x": round(min(all_x), 2),
-        "max_x": round(max(all_x), 2),
-        "min_y": round(min(all_y), 2),
-        "max_y": round(max(all_y), 2)
+        "min_x": round(min_x, 2),
+        "max_x": round(max_x, 2),
+        "min_y": round(min_y, 2),
+        "max_y": round(max_y, 2)
     }
 
-def calculate_bounding_box(boundary: List[Dict]) -> Dict[str, float]:
-    """Calculate bounding box for a province boundary."""
-    if not boundary:
-        return {'min_x': 0, 'max_x': 0, 'min_y': 0, 'max_y': 0}
+def progress_report_at(percent: int, total: int) -> int:
+    """Smallest count of total at which the integer percentage reaches percent."""
+    return -(-percent * total // 100)
 
-    xs = [p['x'] for p in boundary]
-    ys = [p['y'] for p in boundary]
+def measure_candidate_pairs(province_coords: List[Tuple[List[float], List[float]]],
+                            bboxes: List[Dict], tolerance: float,
+                            workers: int = None,
+                            known: Dict[Tuple[int, int], float] = None) -> List[Tuple[int, int, float]]:
+    """
+    Measure the shared border of every province pair whose boxes overlap.
+    Returns (i, j, border_length) sorted by (i, j), including pairs with no
+    shared border. Pairs in known are not measured or returned.
+    """
+    # Bounding box sweep (FAST) - only provinces whose boxes overlap are ever
+    # paired, instead of comparing every pair; pairs come back sorted by (i, j)
+    candidate_pairs = find_candidate_pairs(province_coords, bboxes, tolerance * 2)
+    if known:
+        candidate_pairs = [pair for pair in candidate_pairs if pair not in known]
+    total_comparisons = len(candidate_pairs)
+    comparisons_done = 0
+    shared_borders = 0
 
-    return {
-        'min_x': min(xs),
-        'max_x': max(xs),
-        'min_y': min(ys),
-        'max_y': max(ys)
-    }
+    print(f"  Total comparisons needed: {total_comparisons}")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # Pairs are independent, so large sets are measured in worker processes;
+    # results come back in pair order, keeping neighbor order deterministic
+    if workers > 1 and total_comparisons >= PARALLEL_MIN_PAIRS:
+        print(f"  Measuring borders with {workers} worker processes...")
+        return measure_pairs_parallel(province_coords, candidate_pairs, tolerance, workers, bboxes)
+
+    # Edge geometry is built once per province and reused by every pair it is in
+    province_edges = [coords_to_edges(xs, ys, tolerance) if len(xs) >= 3 else []
+                      for xs, ys in province_coords]
+
+    # Progress indicator every 10%: the pair count at which the next report is
+    # due is worked out once per report instead of a percentage on every pair
+    next_report_at = progress_report_at(10, total_comparisons)
 
-def bounding_boxes_overlap(bbox1: Dict, bbox2: Dict, tolerance: float) -> bool:
-    """Check if two bounding boxes overlap (with tolerance)."""
-    return not (bbox1['max_x'] + tolerance < bbox2['min_x'] or
-                bbox2['max_x'] + tolerance < bbox1['min_x'] or
-                bbox1['max_y'] + tolerance < bbox2['min_y'] or
-                bbox2['max_y'] + tolerance < bbox1['min_y'])
+    measured = []
+    # Bound once as locals for the loop below, which runs once per candidate pair
+    measure_pair = pair_border_length
+    add_measured = measured.append
+    for i, j in candidate_pairs:
+        comparisons_done += 1
 
-def recalculate_all_adjacencies(provinces: List[Dict], tolerance: float = None):
+        if comparisons_done >= next_report_at:
+            current_percent = (comparisons_done * 100) // total_comparisons
+            print(f"  Progress: {current_percent}% ({comparisons_done}/{total_comparisons} pairs, {shared_borders} adjacencies)")
+            next_report_at = progress_report_at(current_percent + 10, total_comparisons)
+
+        # Detailed neighbor check (SLOW) - only edges reaching into the other
+        # province's box are compared, detecting and measuring the border in one pass
+        border_length = measure_pair(province_edges[i], province_edges[j],
+                                     bboxes[i], bboxes[j], tolerance)
+        add_measured((i, j, border_length))
+        if border_length > tolerance:
+            shared_borders += 1
+
+    return measured
+
+def recalculate_all_adjacencies(provinces: List[Dict], tolerance: float = None,
+                                province_coords: List[Tuple[List[float], List[float]]] = None,
+                                bboxes: List[Dict] = None, workers: int = None,
+                                use_shapely: bool = False,
+                                known: Dict[Tuple[int, int], float] = None):
     """
     Recalculate all adjacencies for the combined map.
     This ensures cross-border adjacencies are properly calculated.
+    province_coords (map_coords) and their bboxes may be passed in if they
+    were already computed. Large candidate sets are measured in worker
+    processes (workers defaults to the CPU count, 1 disables).
+    use_shapely measures borders with GEOS instead, falling back to the
+    built-in edge matching if shapely is not installed.
+    known maps (i, j) index pairs (i < j) to border lengths that are already
+    known (country_known_pairs); those pairs are used as given, not measured.
     """
     print("\nRecalculating adjacencies for combined map...")
 
-    if tolerance is None:
-        tolerance = calculate_adaptive_tolerance(provinces)
-
     # Pre-calculate bounding boxes for spatial optimization
-    print(f"  Pre-calculating bounding boxes for {len(provinces)} provinces...")
-    bboxes = []
-    for province in provinces:
-        bbox = calculate_bounding_box(province.get('boundary', []))
-        bboxes.append(bbox)
+    if province_coords is None:
+        province_coords = map_coords(provinces)
+    if bboxes is None:
+        print(f"  Pre-calculating bounding boxes for {len(provinces)} provinces...")
+        bboxes = [coords_bounding_box(xs, ys) for xs, ys in province_coords]
+
+    # The tolerance comes from the same boxes instead of rescanning every boundary
+    if tolerance is None:
+        tolerance = calculate_adaptive_tolerance(provinces, province_coords, bboxes)
 
     # Clear existing neighbors and create ID mapping
     old_id_to_index = {}
@@ -130,59 +239,42 @@ def recalculate_all_adjacencies(provinces: List[Dict], tolerance: float = None):
         province['neighbors'] = []
         old_id_to_index[province['id']] = i
 
-    total_adjacencies = 0
-    total_comparisons = (len(provinces) * (len(provinces) - 1)) // 2
-    comparisons_done = 0
-    last_reported_percent = 0
-
     print(f"  Processing {len(provinces)} provinces...")
-    print(f"  Total comparisons needed: {total_comparisons}")
 
-    # Calculate adjacencies between all province pairs
-    for i in range(len(provinces)):
-        prov1 = provinces[i]
-        boundary1 = prov1.get('boundary', [])
+    measured = None
+    if use_shapely:
+        try:
+            border_lengths = calculate_border_lengths_shapely(province_coords, tolerance)
+            measured = [(i, j, border_length) for (i, j), border_length in sorted(border_lengths.items())
+                        if not known or (i, j) not in known]
+            print(f"  Measured borders with shapely")
+        except ImportError:
+            print(f"  shapely not available, using built-in edge matching")
 
-        if len(boundary1) < 3:
-            continue
-
-        for j in range(i + 1, len(provinces)):
-            prov2 = provinces[j]
-            boundary2 = prov2.get('boundary', [])
-
-            if len(boundary2) < 3:
-                continue
+    if measured is None:
+        measured = measure_candidate_pairs(province_coords, bboxes, tolerance, workers, known)
 
-            comparisons_done += 1
+    if known:
+        print(f"  Reused {len(known)} province pairs within countries")
+        measured = sorted(measured + [(i, j, border_length) for (i, j), border_length in known.items()])
 
-            # Progress indicator every 10%
-            current_percent = (comparisons_done * 100) // total_comparisons
-            if current_percent >= last_reported_percent + 10:
-                print(f"  Progress: {current_percent}% ({comparisons_done}/{total_comparisons} pairs, {total_adjacencies} adjacencies)")
-                last_reported_percent = current_percent
-
-            # Bounding box pre-filter (FAST) - skip provinces far apart
-            if not bounding_boxes_overlap(bboxes[i], bboxes[j], tolerance * 2):
-                continue
-
-            # Detailed neighbor check (SLOW)
-            if not are_neighbors(boundary1, boundary2, tolerance):
-                continue
-
-            # Calculate border length
-            border_length = calculate_border_length(boundary1, boundary2, tolerance)
-
-            # Only add if significant border
-            if border_length > tolerance:
-                prov1['neighbors'].append({
-                    'id': prov2['id'],
-                    'border_length': round(border_length, 2)
-                })
-                prov2['neighbors'].append({
-                    'id': prov1['id'],
-                    'border_length': round(border_length, 2)
-                })
-                total_adjacencies += 1
+    # Add the measured province pairs that share a border
+    total_adjacencies = 0
+    for i, j, border_length in measured:
+        prov1 = provinces[i]
+        prov2 = provinces[j]
+
+        # Only add if significant border
+        if border_length > tolerance:
+            prov1['neighbors'].append({
+                'id': prov2['id'],
+                'border_length': round(border_length, 2)
+            })
+            prov2['neighbors'].append({
+                'id': prov1['id'],
+                'border_length': round(border_length, 2)
+            })
+            total_adjacencies += 1
 
     print(f"\n  ✓ Found {total_adjacencies} adjacencies")
 
@@ -201,6 +293,36 @@ def recalculate_all_adjacencies(provinces: List[Dict], tolerance: float = None):
 
 def main():
     """Main function to update the combined Europe map."""
+    parser = argparse.ArgumentParser(description="Combine country maps and recalculate cross-border adjacencies.")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write the combined map without indentation (much faster and smaller, not diff-friendly)",
+    )
+    parser.add_argument(
+        "--inline-boundaries",
+        action="store_true",
+        help="Keep the indentation but write each province boundary on one line (much smaller)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes measuring province borders in parallel (default: CPU count, 1 disables)",
+    )
+    parser.add_argument(
+        "--shapely",
+        action="store_true",
+        help="Measure borders with shapely/GEOS if it is installed",
+    )
+    parser.add_argument(
+        "--reuse-country-neighbors",
+        action="store_true",
+        help="Keep the neighbors stored in each country map and only measure borders between "
+             "countries (countries without stored neighbors are measured in full)",
+    )
+    args = parser.parse_args()
+
     script_dir = Path(__file__).parent
     maps_dir = script_dir / 'maps'
 
@@ -212,16 +334,25 @@ def main():
     all_provinces = []
     province_id = 100
     countries_included = []
+    known_pairs = {}
 
     print("Loading country maps...\n")
 
-    for country_name in ALL_EUROPEAN_COUNTRIES:
-        country_map = load_country_map(country_name, maps_dir)
+    # Files are read in parallel but consumed in list order, so province IDs
+    # are assigned deterministically
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        country_maps = list(executor.map(lambda country_name: load_country_map(country_name, maps_dir),
+                                         ALL_EUROPEAN_COUNTRIES))
+
+    for country_name, country_map in zip(ALL_EUROPEAN_COUNTRIES, country_maps):
         if not country_map:
             continue
 
         # Extract provinces and renumber them
         num_provinces = len(country_map['map_region'].get('provinces', []))
+        if args.reuse_country_neighbors:
+            known_pairs.update(country_known_pairs(country_map['map_region']['provinces'],
+                                                   len(all_provinces)))
         for province in country_map['map_region']['provinces']:
             # Store old ID for reference
             province['_old_id'] = province['id']
@@ -241,13 +372,18 @@ def main():
 
     print(f"\nTotal provinces loaded: {len(all_provinces)}")
 
+    # Per-province boxes serve both the map bounds and the adjacency pair filter
+    province_coords = map_coords(all_provinces)
+    bboxes = [coords_bounding_box(xs, ys) for xs, ys in province_coords]
+
     # Calculate combined bounds
     print("\nCalculating map bounds...")
-    bounds = calculate_combined_bounds(all_provinces)
+    bounds = calculate_combined_bounds(all_provinces, bboxes)
     print(f"  Bounds: x=[{bounds['min_x']}, {bounds['max_x']}], y=[{bounds['min_y']}, {bounds['max_y']}]")
 
     # Recalculate all adjacencies (including cross-border)
-    recalculate_all_adjacencies(all_provinces)
+    recalculate_all_adjacencies(all_provinces, province_coords=province_coords, bboxes=bboxes,
+                                workers=args.workers, use_shapely=args.shapely, known=known_pairs)
 
     # Clean up temporary fields
     for province in all_provinces:
@@ -272,17 +408,19 @@ def main():
     # Write to file
     output_file = maps_dir / "map_europe_combined.json"
 
-    # Create backup
+    # Create backup - a hardlink to the current file is enough because
+    # write_json replaces the map with a new file rather than rewriting it
     if output_file.exists():
         backup_file = output_file.with_suffix('.json.backup')
         if not backup_file.exists():
-            import shutil
-            shutil.copy2(output_file, backup_file)
+            try:
+                os.link(output_file, backup_file)
+            except OSError:
+                shutil.copy2(output_file, backup_file)
             print(f"\nCreated backup: {backup_file.name}")
 
     print(f"\nWriting combined map to {output_file.name}...")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(map_data, f, indent=2, ensure_ascii=False)
+    write_json(output_file, map_data, args.compact, args.inline_boundaries)
 
     print()
     print("=" * 70)
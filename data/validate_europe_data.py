@@ -3,217 +3,437 @@
 Validate all generated European map and nation data.
 """
 
+import argparse
+import contextlib
 import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, List, Set
-
-def validate_map_structure(map_file: Path) -> List[str]:
-    """Validate a map file structure."""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Map and nation files are parsed with orjson when it is installed
+sys.path.insert(0, str(Path(__file__).parent))
+from generate_europe_maps import file_contents, read_json
+
+# Fields every map, province and nation must have, in reporting order
+MAP_REQUIRED_FIELDS = ('id', 'name', 'description', 'coordinate_system', 'unit', 'bounds', 'provinces')
+MAP_REQUIRED_BOUNDS = ('min_x', 'max_x', 'min_y', 'max_y')
+PROVINCE_REQUIRED_FIELDS = ('id', 'name', 'owner_realm', 'terrain_type', 'center', 'boundary')
+NATION_REQUIRED_FIELDS = ('id', 'name', 'adjective', 'culture_group', 'primary_culture',
+                          'religion', 'government_type', 'capital', 'color')
+
+# The same fields as sets: one C-level subset test accepts a complete record,
+# and the per-field loop only runs to report what is missing
+MAP_FIELD_SET = frozenset(MAP_REQUIRED_FIELDS)
+PROVINCE_FIELD_SET = frozenset(PROVINCE_REQUIRED_FIELDS)
+NATION_FIELD_SET = frozenset(NATION_REQUIRED_FIELDS)
+
+POINT_KEYS = frozenset(('x', 'y'))
+COLOR_KEYS = frozenset(('r', 'g', 'b'))
+
+# Default for dict.get that tells a missing key apart from an explicit null
+MISSING = object()
+
+class ValidationError(Exception):
+    """
+    The first problem found in a file validated with fast_fail, carrying
+    the result the validator returns for that file.
+    """
+    def __init__(self, result: Any):
+        super().__init__(result)
+        self.result = result
+
+@lru_cache(maxsize=None)
+def typed_decoders() -> Optional[Tuple[Any, Any, Tuple[type, ...]]]:
+    """
+    msgspec decoders for a map file and a nation file with every required
+    field, plus the errors they raise, or None when msgspec is not installed.
+    Only structure is declared, like the checks below: values are left
+    untyped and boundary points are kept as raw JSON.
+    """
+    try:
+        import msgspec
+    except ImportError:
+        return None
+
+    Point = msgspec.defstruct('Point', [(key, Any) for key in sorted(POINT_KEYS)])
+    Bounds = msgspec.defstruct('Bounds', [(key, Any) for key in MAP_REQUIRED_BOUNDS])
+    Province = msgspec.defstruct('Province', [(field, Any) for field in PROVINCE_REQUIRED_FIELDS
+                                              if field not in ('center', 'boundary')]
+                                 + [('center', Point), ('boundary', List[msgspec.Raw])])
+    MapRegion = msgspec.defstruct('MapRegion', [(field, Any) for field in MAP_REQUIRED_FIELDS
+                                                if field not in ('bounds', 'provinces')]
+                                  + [('bounds', Bounds), ('provinces', List[Province])])
+    MapFile = msgspec.defstruct('MapFile', [('map_region', MapRegion)])
+
+    Color = msgspec.defstruct('Color', [(key, Any) for key in sorted(COLOR_KEYS)])
+    Nation = msgspec.defstruct('Nation', [(field, Any) for field in NATION_REQUIRED_FIELDS if field != 'color']
+                               + [('color', Color)])
+    NationFile = msgspec.defstruct('NationFile', [('nations', List[Nation])])
+
+    return (msgspec.json.Decoder(MapFile), msgspec.json.Decoder(NationFile),
+            (msgspec.ValidationError, msgspec.DecodeError, TypeError))
+
+def map_file_passes_fast(map_file: Path) -> bool:
+    """
+    Check a map file in one msgspec decode when msgspec is installed.
+    True only for a file with no errors; anything else (or no msgspec) goes
+    through validate_map_structure's full checks, which word the errors.
+    """
+    decoders = typed_decoders()
+    if decoders is None:
+        return False
+
+    map_decoder, _, decode_errors = decoders
+    with file_contents(map_file) as contents:
+        provinces = None
+        try:
+            provinces = map_decoder.decode(contents).map_region.provinces
+            passed = (bool(provinces)
+                      and len({province.id for province in provinces}) == len(provinces)
+                      and all(len(province.boundary) >= 3 for province in provinces))
+        except decode_errors:
+            passed = False
+        # The raw boundaries point into a memory-mapped file's buffer
+        provinces = None
+    return passed
+
+def nation_file_passes_fast(nation_file: Path) -> Optional[int]:
+    """
+    Check a nation file in one msgspec decode (see map_file_passes_fast).
+    Returns the number of nations of a file with no errors, otherwise None.
+    """
+    decoders = typed_decoders()
+    if decoders is None:
+        return None
+
+    _, nation_decoder, decode_errors = decoders
+    with file_contents(nation_file) as contents:
+        try:
+            nations = nation_decoder.decode(contents).nations
+            if nations and len({nation.id for nation in nations}) == len(nations):
+                return len(nations)
+        except decode_errors:
+            pass
+    return None
+
+def validate_map_structure(map_file: Path, fast_fail: bool = False) -> List[str]:
+    """
+    Validate a map file structure.
+    With fast_fail the first problem is raised as a ValidationError instead
+    of checking the rest of the file.
+    """
     errors = []
+    if map_file_passes_fast(map_file):
+        return errors
+
+    def report(message: str) -> None:
+        if fast_fail:
+            raise ValidationError([message])
+        errors.append(message)
 
     try:
-        with open(map_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = read_json(map_file)
 
         # Check top-level structure
         if 'map_region' not in data:
-            errors.append(f"{map_file.name}: Missing 'map_region' key")
+            report(f"{map_file.name}: Missing 'map_region' key")
             return errors
 
         map_region = data['map_region']
 
         # Required fields
-        required_fields = ['id', 'name', 'description', 'coordinate_system', 'unit', 'bounds', 'provinces']
-        for field in required_fields:
-            if field not in map_region:
-                errors.append(f"{map_file.name}: Missing required field '{field}'")
+        if not MAP_FIELD_SET.issubset(map_region):
+            for field in MAP_REQUIRED_FIELDS:
+                if field not in map_region:
+                    report(f"{map_file.name}: Missing required field '{field}'")
 
         # Check bounds
         if 'bounds' in map_region:
             bounds = map_region['bounds']
-            required_bounds = ['min_x', 'max_x', 'min_y', 'max_y']
-            for bound in required_bounds:
+            for bound in MAP_REQUIRED_BOUNDS:
                 if bound not in bounds:
-                    errors.append(f"{map_file.name}: Missing bound '{bound}'")
+                    report(f"{map_file.name}: Missing bound '{bound}'")
 
         # Check provinces
         if 'provinces' in map_region:
             provinces = map_region['provinces']
             if not isinstance(provinces, list):
-                errors.append(f"{map_file.name}: 'provinces' should be a list")
+                report(f"{map_file.name}: 'provinces' should be a list")
             elif len(provinces) == 0:
-                errors.append(f"{map_file.name}: No provinces defined")
+                report(f"{map_file.name}: No provinces defined")
             else:
                 # Validate each province
                 province_ids = set()
                 for i, province in enumerate(provinces):
                     # Check required fields
-                    required_province_fields = ['id', 'name', 'owner_realm', 'terrain_type',
-                                                'center', 'boundary']
-                    for field in required_province_fields:
-                        if field not in province:
-                            errors.append(f"{map_file.name}: Province {i} missing '{field}'")
+                    if not PROVINCE_FIELD_SET.issubset(province):
+                        for field in PROVINCE_REQUIRED_FIELDS:
+                            if field not in province:
+                                report(f"{map_file.name}: Province {i} missing '{field}'")
+
+                    # Anything but an object has been reported as missing every field
+                    if not isinstance(province, dict):
+                        continue
+
+                    # One lookup per field; the checks below use the locals
+                    province_id = province.get('id', MISSING)
+                    center = province.get('center', MISSING)
+                    boundary = province.get('boundary', MISSING)
 
                     # Check for duplicate IDs
-                    if 'id' in province:
-                        if province['id'] in province_ids:
-                            errors.append(f"{map_file.name}: Duplicate province ID {province['id']}")
-                        province_ids.add(province['id'])
+                    if province_id is not MISSING:
+                        if province_id in province_ids:
+                            report(f"{map_file.name}: Duplicate province ID {province_id}")
+                        province_ids.add(province_id)
 
                     # Check center coordinates
-                    if 'center' in province:
-                        if not isinstance(province['center'], dict):
-                            errors.append(f"{map_file.name}: Province {i} center not a dict")
-                        elif 'x' not in province['center'] or 'y' not in province['center']:
-                            errors.append(f"{map_file.name}: Province {i} center missing x or y")
+                    if center is not MISSING:
+                        if not isinstance(center, dict):
+                            report(f"{map_file.name}: Province {i} center not a dict")
+                        elif not POINT_KEYS.issubset(center):
+                            report(f"{map_file.name}: Province {i} center missing x or y")
 
                     # Check boundary
-                    if 'boundary' in province:
-                        if not isinstance(province['boundary'], list):
-                            errors.append(f"{map_file.name}: Province {i} boundary not a list")
-                        elif len(province['boundary']) < 3:
-                            errors.append(f"{map_file.name}: Province {i} boundary has < 3 points")
+                    if boundary is not MISSING:
+                        if not isinstance(boundary, list):
+                            report(f"{map_file.name}: Province {i} boundary not a list")
+                        elif len(boundary) < 3:
+                            report(f"{map_file.name}: Province {i} boundary has < 3 points")
 
     except json.JSONDecodeError as e:
         errors.append(f"{map_file.name}: JSON decode error - {str(e)}")
+    except ValidationError:
+        raise
     except Exception as e:
         errors.append(f"{map_file.name}: Unexpected error - {str(e)}")
 
     return errors
 
-def validate_nation_structure(nation_file: Path) -> List[str]:
-    """Validate a nation file structure."""
+def validate_nation_structure(nation_file: Path, fast_fail: bool = False) -> Tuple[List[str], Optional[int]]:
+    """
+    Validate a nation file structure (fast_fail as in validate_map_structure).
+    Returns the errors and the number of nations, which is None when the
+    file has no nations list, so the statistics need not parse it again.
+    """
     errors = []
+    nation_count = nation_file_passes_fast(nation_file)
+    if nation_count is not None:
+        return errors, nation_count
+
+    def report(message: str) -> None:
+        if fast_fail:
+            raise ValidationError(([message], nation_count))
+        errors.append(message)
 
     try:
-        with open(nation_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = read_json(nation_file)
 
         # Check top-level structure
         if 'nations' not in data:
-            errors.append(f"{nation_file.name}: Missing 'nations' key")
-            return errors
+            report(f"{nation_file.name}: Missing 'nations' key")
+            return errors, nation_count
 
         nations = data['nations']
         if not isinstance(nations, list):
-            errors.append(f"{nation_file.name}: 'nations' should be a list")
-            return errors
+            report(f"{nation_file.name}: 'nations' should be a list")
+            return errors, nation_count
 
-        if len(nations) == 0:
-            errors.append(f"{nation_file.name}: No nations defined")
-            return errors
+        nation_count = len(nations)
+        if nation_count == 0:
+            report(f"{nation_file.name}: No nations defined")
+            return errors, nation_count
 
         # Validate each nation
         nation_ids = set()
         for i, nation in enumerate(nations):
             # Check required fields
-            required_fields = ['id', 'name', 'adjective', 'culture_group', 'primary_culture',
-                              'religion', 'government_type', 'capital', 'color']
-            for field in required_fields:
-                if field not in nation:
-                    errors.append(f"{nation_file.name}: Nation {i} missing '{field}'")
+            if not NATION_FIELD_SET.issubset(nation):
+                for field in NATION_REQUIRED_FIELDS:
+                    if field not in nation:
+                        report(f"{nation_file.name}: Nation {i} missing '{field}'")
 
             # Check for duplicate IDs
             if 'id' in nation:
                 if nation['id'] in nation_ids:
-                    errors.append(f"{nation_file.name}: Duplicate nation ID {nation['id']}")
+                    report(f"{nation_file.name}: Duplicate nation ID {nation['id']}")
                 nation_ids.add(nation['id'])
 
             # Check color
             if 'color' in nation:
                 if not isinstance(nation['color'], dict):
-                    errors.append(f"{nation_file.name}: Nation {i} color not a dict")
-                elif 'r' not in nation['color'] or 'g' not in nation['color'] or 'b' not in nation['color']:
-                    errors.append(f"{nation_file.name}: Nation {i} color missing r, g, or b")
+                    report(f"{nation_file.name}: Nation {i} color not a dict")
+                elif not COLOR_KEYS.issubset(nation['color']):
+                    report(f"{nation_file.name}: Nation {i} color missing r, g, or b")
 
     except json.JSONDecodeError as e:
         errors.append(f"{nation_file.name}: JSON decode error - {str(e)}")
+    except ValidationError:
+        raise
     except Exception as e:
         errors.append(f"{nation_file.name}: Unexpected error - {str(e)}")
 
-    return errors
-
-def count_files_and_provinces():
-    """Count all map files and provinces."""
+    return errors, nation_count
+
+def scan_data_files(maps_dir: Path, nations_dir: Path) -> Tuple[List[Path], List[Path]]:
+    """
+    List the map_*.json and nations_*.json files, sorted by name.
+    Each directory is read once here and the lists are shared by the
+    validation and statistics passes instead of globbing again.
+    """
+    def scan(directory: Path, prefix: str) -> List[Path]:
+        with os.scandir(directory) as entries:
+            names = [entry.name for entry in entries
+                     if entry.name.startswith(prefix) and entry.name.endswith('.json')]
+        return [directory / name for name in sorted(names)]
+
+    return scan(maps_dir, 'map_'), scan(nations_dir, 'nations_')
+
+def count_provinces(map_file: Path) -> int:
+    """
+    Count the provinces of a map file.
+    With ijson installed the file is streamed and only the province objects
+    are counted, so no boundary is ever built; otherwise the map is parsed.
+    """
+    try:
+        import ijson
+    except ImportError:
+        return len(read_json(map_file)['map_region']['provinces'])
+
+    with open(map_file, 'rb') as f:
+        return sum(1 for prefix, event, _ in ijson.parse(f)
+                   if event == 'start_map' and prefix == 'map_region.provinces.item')
+
+def count_files_and_provinces(map_files: List[Path], nation_files: List[Path],
+                              nation_counts: List[Optional[int]], out_lines: List[str]):
+    """
+    Count all map files and provinces, adding the report to out_lines.
+    nation_counts holds what validation counted for each nation file; only
+    files it could not count are parsed here.
+    """
     maps_dir = Path('data/maps')
-    nations_dir = Path('data/nations')
 
     # Count map files
-    map_files = list(maps_dir.glob('map_*_real.json'))
-    regional_files = list(maps_dir.glob('map_*.json'))
-    regional_files = [f for f in regional_files if '_real.json' not in f.name and f.name != 'map_europe_combined.json']
+    country_files = [f for f in map_files if f.name[len('map_'):].endswith('_real.json')]
+    regional_files = [f for f in map_files if '_real.json' not in f.name and f.name != 'map_europe_combined.json']
 
-    print(f"\n📊 File Statistics:")
-    print(f"   Individual country maps: {len(map_files)}")
-    print(f"   Regional grouping maps: {len(regional_files)}")
+    out_lines.append(f"\n📊 File Statistics:")
+    out_lines.append(f"   Individual country maps: {len(country_files)}")
+    out_lines.append(f"   Regional grouping maps: {len(regional_files)}")
 
     # Count provinces in combined map
     combined_file = maps_dir / 'map_europe_combined.json'
     if combined_file.exists():
-        with open(combined_file, 'r') as f:
-            combined_data = json.load(f)
-            province_count = len(combined_data['map_region']['provinces'])
-            print(f"   Combined Europe provinces: {province_count}")
+        province_count = count_provinces(combined_file)
+        out_lines.append(f"   Combined Europe provinces: {province_count}")
 
     # Count nation files and nations
-    nation_files = list(nations_dir.glob('nations_*.json'))
     total_nations = 0
-    for nf in nation_files:
-        with open(nf, 'r') as f:
-            data = json.load(f)
-            total_nations += len(data['nations'])
+    for nf, nation_count in zip(nation_files, nation_counts):
+        if nation_count is None:
+            nation_count = len(read_json(nf)['nations'])
+        total_nations += nation_count
+
+    out_lines.append(f"   Nation data files: {len(nation_files)}")
+    out_lines.append(f"   Total nations defined: {total_nations}")
+
+def first_error(validate: Callable[..., Any], path: Path) -> Any:
+    """Validate a file with fast_fail, returning at most its first error."""
+    try:
+        return validate(path, fast_fail=True)
+    except ValidationError as e:
+        return e.result
+
+def validate_files(validate: Callable[[Path], Any], files: List[Path],
+                   executor: ProcessPoolExecutor = None) -> Iterable[Any]:
+    """Validate files in order, in the worker processes when an executor is given."""
+    if executor is None:
+        return map(validate, files)
 
-    print(f"   Nation data files: {len(nation_files)}")
-    print(f"   Total nations defined: {total_nations}")
+    # Batches of files per task keep the inter-process overhead small
+    return executor.map(validate, files, chunksize=8)
 
 def main():
     """Main validation function."""
-    print("🔍 Validating European map and nation data...\n")
+    parser = argparse.ArgumentParser(description="Validate all generated European map and nation data.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes validating files in parallel (default: CPU count, 1 disables)",
+    )
+    parser.add_argument(
+        "--fast-fail",
+        action="store_true",
+        help="Report only the first error of each broken file (enough for a pass/fail check)",
+    )
+    args = parser.parse_args()
+    workers = args.workers if args.workers is not None else os.cpu_count() or 1
+
+    # The report is collected here and written in one go at the end
+    out_lines: List[str] = []
+    out_lines.append("🔍 Validating European map and nation data...\n")
 
     maps_dir = Path('data/maps')
     nations_dir = Path('data/nations')
 
     all_errors = []
+    map_files, nation_files = scan_data_files(maps_dir, nations_dir)
+
+    # Every file is validated on its own, so they are spread over worker
+    # processes; results come back in file order
+    validate_map: Callable[[Path], List[str]] = validate_map_structure
+    validate_nation: Callable[[Path], Tuple[List[str], Optional[int]]] = validate_nation_structure
+    if args.fast_fail:
+        validate_map = partial(first_error, validate_map_structure)
+        validate_nation = partial(first_error, validate_nation_structure)
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else contextlib.nullcontext()
+    with pool as executor:
+        map_results = validate_files(validate_map, map_files, executor)
+        nation_results = validate_files(validate_nation, nation_files, executor)
+
+        # Validate all map files
+        out_lines.append("Validating map files...")
+        valid_maps = 0
+        for errors in map_results:
+            if errors:
+                all_errors.extend(errors)
+            else:
+                valid_maps += 1
+
+        out_lines.append(f"   ✓ {valid_maps}/{len(map_files)} map files valid")
+
+        # Validate all nation files
+        out_lines.append("\nValidating nation files...")
+        valid_nations = 0
+        nation_counts = []
+        for errors, nation_count in nation_results:
+            nation_counts.append(nation_count)
+            if errors:
+                all_errors.extend(errors)
+            else:
+                valid_nations += 1
 
-    # Validate all map files
-    print("Validating map files...")
-    map_files = sorted(maps_dir.glob('map_*.json'))
-    valid_maps = 0
-    for map_file in map_files:
-        errors = validate_map_structure(map_file)
-        if errors:
-            all_errors.extend(errors)
-        else:
-            valid_maps += 1
-
-    print(f"   ✓ {valid_maps}/{len(map_files)} map files valid")
-
-    # Validate all nation files
-    print("\nValidating nation files...")
-    nation_files = sorted(nations_dir.glob('nations_*.json'))
-    valid_nations = 0
-    for nation_file in nation_files:
-        errors = validate_nation_structure(nation_file)
-        if errors:
-            all_errors.extend(errors)
-        else:
-            valid_nations += 1
-
-    print(f"   ✓ {valid_nations}/{len(nation_files)} nation files valid")
+        out_lines.append(f"   ✓ {valid_nations}/{len(nation_files)} nation files valid")
 
     # Count files and provinces
-    count_files_and_provinces()
+    count_files_and_provinces(map_files, nation_files, nation_counts, out_lines)
 
     # Report errors
     if all_errors:
-        print(f"\n❌ Found {len(all_errors)} errors:\n")
-        for error in all_errors:
-            print(f"   • {error}")
-        return 1
+        out_lines.append(f"\n❌ Found {len(all_errors)} errors:\n")
+        out_lines.extend(f"   • {error}" for error in all_errors)
+        status = 1
     else:
-        print("\n✅ All validation checks passed!")
-        print("\n🎉 European regions and geography data is complete and valid!")
-        return 0
+        out_lines.append("\n✅ All validation checks passed!")
+        out_lines.append("\n🎉 European regions and geography data is complete and valid!")
+        status = 0
+
+    sys.stdout.write("\n".join(out_lines) + "\n")
+    return status
 
 if __name__ == '__main__':
     exit(main())
@@ -3,17 +3,50 @@
 Comprehensive validation for 11th century historical data.
 """
 
+import ast
 import json
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Set
 
+# Map files are parsed with orjson when it is installed
+sys.path.insert(0, str(Path(__file__).parent))
+from generate_europe_maps import read_json
+
+# Map files are validated by this many threads at once
+VALIDATE_WORKERS = 8
+
+# Required fields are checked in this order, so missing ones are reported in it
+MAP_REQUIRED_FIELDS = ('id', 'name', 'description', 'coordinate_system', 'unit', 'bounds', 'provinces')
+PROVINCE_REQUIRED_FIELDS = ('id', 'name', 'owner_realm', 'terrain_type', 'center', 'boundary', 'religion')
+NATION_REQUIRED_FIELDS = ('id', 'name', 'adjective', 'culture_group', 'primary_culture',
+                          'religion', 'government_type', 'capital', 'color', 'historical_info',
+                          'national_ideas', 'starting_attributes')
+
+VALID_RELIGIONS = frozenset(('catholic', 'orthodox', 'sunni', 'pagan', 'shia'))
+BOUNDS_KEYS = frozenset(('min_x', 'max_x', 'min_y', 'max_y'))
+COLOR_KEYS = frozenset(('r', 'g', 'b'))
+HISTORICAL_INFO_KEYS = frozenset(('founded', 'notable_rulers', 'historical_notes'))
+NATIONAL_IDEAS_KEYS = frozenset(('traditions', 'ideas', 'ambition'))
+
+@lru_cache(maxsize=None)
+def load_json(json_file: Path) -> Dict:
+    """
+    Parse a JSON file once per run.
+    The combined map and the nation file are read by several checks; later
+    reads reuse the parsed data, which the checks only inspect.
+    """
+    return read_json(json_file)
+
 def validate_map_file(map_file: Path) -> List[str]:
     """Validate a historical map file."""
     errors = []
 
     try:
-        with open(map_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_json(map_file)
 
         # Check structure
         if 'map_region' not in data:
@@ -23,8 +56,7 @@ def validate_map_file(map_file: Path) -> List[str]:
         mr = data['map_region']
 
         # Check required fields
-        required = ['id', 'name', 'description', 'coordinate_system', 'unit', 'bounds', 'provinces']
-        for field in required:
+        for field in MAP_REQUIRED_FIELDS:
             if field not in mr:
                 errors.append(f"{map_file.name}: Missing field '{field}'")
 
@@ -44,20 +76,12 @@ def validate_map_file(map_file: Path) -> List[str]:
             if not provinces:
                 errors.append(f"{map_file.name}: Empty provinces list")
 
-            province_ids = set()
             for i, prov in enumerate(provinces):
                 # Check required province fields
-                req_prov = ['id', 'name', 'owner_realm', 'terrain_type', 'center', 'boundary', 'religion']
-                for field in req_prov:
+                for field in PROVINCE_REQUIRED_FIELDS:
                     if field not in prov:
                         errors.append(f"{map_file.name}: Province {i} missing '{field}'")
 
-                # Check for duplicate province IDs
-                if 'id' in prov:
-                    if prov['id'] in province_ids:
-                        errors.append(f"{map_file.name}: Duplicate province ID {prov['id']}")
-                    province_ids.add(prov['id'])
-
                 # Check boundary
                 if 'boundary' in prov:
                     if not isinstance(prov['boundary'], list):
@@ -70,14 +94,19 @@ def validate_map_file(map_file: Path) -> List[str]:
                     errors.append(f"{map_file.name}: Province {i} wrong historical_year")
 
                 # Validate religion values
-                valid_religions = ['catholic', 'orthodox', 'sunni', 'pagan', 'shia']
-                if 'religion' in prov and prov['religion'] not in valid_religions:
+                if 'religion' in prov and prov['religion'] not in VALID_RELIGIONS:
                     errors.append(f"{map_file.name}: Province {i} invalid religion '{prov['religion']}'")
 
+            # Check for duplicate province IDs (reported once per repeat)
+            id_counts = Counter(prov['id'] for prov in provinces if 'id' in prov)
+            for province_id, count in id_counts.items():
+                if count > 1:
+                    errors.extend([f"{map_file.name}: Duplicate province ID {province_id}"] * (count - 1))
+
         # Check bounds
         if 'bounds' in mr:
             bounds = mr['bounds']
-            if not all(k in bounds for k in ['min_x', 'max_x', 'min_y', 'max_y']):
+            if not BOUNDS_KEYS.issubset(bounds):
                 errors.append(f"{map_file.name}: Incomplete bounds")
             elif bounds['min_x'] >= bounds['max_x'] or bounds['min_y'] >= bounds['max_y']:
                 errors.append(f"{map_file.name}: Invalid bounds (min >= max)")
@@ -94,56 +123,50 @@ def validate_nation_file(nation_file: Path) -> List[str]:
     errors = []
 
     try:
-        with open(nation_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_json(nation_file)
 
         if 'nations' not in data:
             errors.append(f"{nation_file.name}: Missing 'nations' key")
             return errors
 
         nations = data['nations']
-        nation_ids = set()
 
         for i, nation in enumerate(nations):
             # Check required fields
-            required = ['id', 'name', 'adjective', 'culture_group', 'primary_culture',
-                       'religion', 'government_type', 'capital', 'color', 'historical_info',
-                       'national_ideas', 'starting_attributes']
-
-            for field in required:
+            for field in NATION_REQUIRED_FIELDS:
                 if field not in nation:
                     errors.append(f"{nation_file.name}: Nation {i} missing '{field}'")
 
-            # Check duplicate IDs
-            if 'id' in nation:
-                if nation['id'] in nation_ids:
-                    errors.append(f"{nation_file.name}: Duplicate nation ID {nation['id']}")
-                nation_ids.add(nation['id'])
-
             # Check color
             if 'color' in nation:
                 color = nation['color']
-                if not all(k in color for k in ['r', 'g', 'b']):
+                if not COLOR_KEYS.issubset(color):
                     errors.append(f"{nation_file.name}: Nation {i} incomplete color")
-                elif not all(0 <= color[k] <= 255 for k in ['r', 'g', 'b']):
+                elif not all(0 <= color[k] <= 255 for k in COLOR_KEYS):
                     errors.append(f"{nation_file.name}: Nation {i} invalid color values")
 
             # Check historical_info
             if 'historical_info' in nation:
                 hist = nation['historical_info']
-                if not all(k in hist for k in ['founded', 'notable_rulers', 'historical_notes']):
+                if not HISTORICAL_INFO_KEYS.issubset(hist):
                     errors.append(f"{nation_file.name}: Nation {i} incomplete historical_info")
 
             # Check national_ideas structure
             if 'national_ideas' in nation:
                 ideas = nation['national_ideas']
-                if not all(k in ideas for k in ['traditions', 'ideas', 'ambition']):
+                if not NATIONAL_IDEAS_KEYS.issubset(ideas):
                     errors.append(f"{nation_file.name}: Nation {i} incomplete national_ideas")
 
                 # Check we have 7 ideas
                 if 'ideas' in ideas and len(ideas['ideas']) != 7:
                     errors.append(f"{nation_file.name}: Nation {i} should have 7 ideas, has {len(ideas['ideas'])}")
 
+        # Check duplicate IDs (reported once per repeat)
+        id_counts = Counter(nation['id'] for nation in nations if 'id' in nation)
+        for nation_id, count in id_counts.items():
+            if count > 1:
+                errors.extend([f"{nation_file.name}: Duplicate nation ID {nation_id}"] * (count - 1))
+
     except json.JSONDecodeError as e:
         errors.append(f"{nation_file.name}: JSON error - {str(e)}")
     except Exception as e:
@@ -161,20 +184,31 @@ def check_coordinate_consistency(maps_dir: Path) -> List[str]:
         return errors
 
     try:
-        with open(combined_file, 'r') as f:
-            data = json.load(f)
+        data = load_json(combined_file)
 
         bounds = data['map_region']['bounds']
         provinces = data['map_region']['provinces']
 
         # Check that all province coordinates are within bounds
+        min_x, max_x = bounds['min_x'], bounds['max_x']
+        min_y, max_y = bounds['min_y'], bounds['max_y']
         for prov in provinces:
-            for point in prov.get('boundary', []):
-                x, y = point.get('x', 0), point.get('y', 0)
+            boundary = prov.get('boundary', [])
+            if not boundary:
+                continue
+
+            xs = [point.get('x', 0) for point in boundary]
+            ys = [point.get('y', 0) for point in boundary]
+
+            # A province whose extent lies inside the bounds has no stray
+            # points; only the others are scanned point by point for the report
+            if min(xs) >= min_x and max(xs) <= max_x and min(ys) >= min_y and max(ys) <= max_y:
+                continue
 
-                if x < bounds['min_x'] or x > bounds['max_x']:
+            for x, y in zip(xs, ys):
+                if x < min_x or x > max_x:
                     errors.append(f"Province {prov.get('name', 'unknown')} has x={x} outside bounds")
-                if y < bounds['min_y'] or y > bounds['max_y']:
+                if y < min_y or y > max_y:
                     errors.append(f"Province {prov.get('name', 'unknown')} has y={y} outside bounds")
 
         # Check bounds are reasonable for historical Europe
@@ -205,18 +239,16 @@ def check_data_consistency(maps_dir: Path, nation_file: Path) -> List[str]:
             if map_file.name == 'map_europe_1100.json':
                 continue
 
-            with open(map_file, 'r') as f:
-                data = json.load(f)
-                map_id = data['map_region']['id'].replace('_1100', '')
-                map_polities.add(map_id)
+            data = load_json(map_file)
+            map_id = data['map_region']['id'].replace('_1100', '')
+            map_polities.add(map_id)
 
         # Get all nation IDs
         nation_ids = set()
         if nation_file.exists():
-            with open(nation_file, 'r') as f:
-                data = json.load(f)
-                for nation in data['nations']:
-                    nation_ids.add(nation['id'])
+            data = load_json(nation_file)
+            for nation in data['nations']:
+                nation_ids.add(nation['id'])
 
         # Major polities should have nation definitions
         major_polities = {'kievan_rus', 'holy_roman_empire', 'france', 'england',
@@ -246,21 +278,29 @@ def validate_generation_script() -> List[str]:
         return errors
 
     try:
-        # Check syntax
+        # Check syntax; the parsed tree is walked once for the checks below
         with open(script_path, 'r') as f:
             code = f.read()
-        compile(code, str(script_path), 'exec')
+        tree = ast.parse(code, str(script_path))
+
+        defined_functions = set()
+        has_error_handling = False
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                defined_functions.add(node.name)
+            elif isinstance(node, ast.Try) and node.handlers:
+                has_error_handling = True
 
         # Check for required functions
-        required_functions = ['convert_coordinates', 'is_in_europe', 'extract_main_polygon',
+        required_functions = ['convert_geojson_polygon', 'is_in_europe', 'extract_main_polygon',
                             'create_province', 'generate_entity_maps', 'main']
 
         for func in required_functions:
-            if f'def {func}(' not in code:
+            if func not in defined_functions:
                 errors.append(f"Missing function: {func}")
 
         # Check for proper error handling
-        if 'try:' not in code or 'except' not in code:
+        if not has_error_handling:
             errors.append("Script lacks error handling")
 
     except SyntaxError as e:
@@ -299,9 +339,13 @@ def main():
         map_files = list(maps_dir.glob('map_*_1100.json'))
         print(f"   Found {len(map_files)} map files")
 
+        # Threads share the load_json cache with the checks below; results
+        # come back in file order
+        with ThreadPoolExecutor(max_workers=VALIDATE_WORKERS) as executor:
+            file_errors = list(executor.map(validate_map_file, map_files))
+
         map_errors_count = 0
-        for map_file in map_files:
-            errors = validate_map_file(map_file)
+        for errors in file_errors:
             if errors:
                 all_errors.extend(errors)
                 map_errors_count += 1
@@ -324,9 +368,8 @@ def main():
             all_errors.extend(nation_errors)
             print(f"   ❌ {len(nation_errors)} errors found")
         else:
-            with open(nation_file, 'r') as f:
-                data = json.load(f)
-                print(f"   ✓ All {len(data['nations'])} nations valid")
+            data = load_json(nation_file)
+            print(f"   ✓ All {len(data['nations'])} nations valid")
 
     # Check coordinate consistency
     print("\n4. Checking coordinate consistency...")
@@ -373,14 +416,12 @@ def main():
             print(f"   Combined Europe map: 1")
 
             if combined.exists():
-                with open(combined, 'r') as f:
-                    data = json.load(f)
-                    print(f"   Total provinces: {len(data['map_region']['provinces'])}")
+                data = load_json(combined)
+                print(f"   Total provinces: {len(data['map_region']['provinces'])}")
 
             if nation_file.exists():
-                with open(nation_file, 'r') as f:
-                    data = json.load(f)
-                    print(f"   Nation definitions: {len(data['nations'])}")
+                data = load_json(nation_file)
+                print(f"   Nation definitions: {len(data['nations'])}")
 
         print("\n✨ 11th century historical data is production-ready!")
         print("="*75)
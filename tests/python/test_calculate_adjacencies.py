@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for the pair-by-pair border measurement in data/calculate_adjacencies.py.
+"""
+
+import math
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'data'))
+import calculate_adjacencies
+
+def wedge_provinces(count: int, points: int):
+    """
+    Slices of a disc around the origin. Every slice's bounding box overlaps
+    every other's, and neighboring slices share a radial edge.
+    """
+    province_coords = []
+    for k in range(count):
+        start = 2 * math.pi * k / count
+        end = 2 * math.pi * (k + 1) / count
+        xs = [0.0]
+        ys = [0.0]
+        for t in range(points):
+            angle = start + (end - start) * t / (points - 1)
+            xs.append(round(1000 * math.cos(angle), 2))
+            ys.append(round(1000 * math.sin(angle), 2))
+        province_coords.append((xs, ys))
+    return province_coords
+
+class PairwiseParallelTest(unittest.TestCase):
+    def setUp(self):
+        self.province_coords = wedge_provinces(calculate_adjacencies.SPATIAL_INDEX_MIN_PROVINCES - 1, 250)
+        self.bboxes = [calculate_adjacencies.coords_bounding_box(xs, ys) for xs, ys in self.province_coords]
+        self.tolerance = 1.0
+
+    def test_dense_map_reaches_parallel_threshold(self):
+        pairs = calculate_adjacencies.find_candidate_pairs(self.province_coords, self.bboxes,
+                                                           self.tolerance * 2)
+        self.assertGreaterEqual(calculate_adjacencies.pair_work(self.province_coords, pairs),
+                                calculate_adjacencies.PARALLEL_MIN_VERTEX_PAIRS)
+
+    def test_parallel_matches_serial(self):
+        serial = calculate_adjacencies.calculate_border_lengths_pairwise(
+            self.province_coords, self.tolerance, workers=1, bboxes=self.bboxes)
+
+        with mock.patch.object(calculate_adjacencies, 'measure_pairs_parallel',
+                               wraps=calculate_adjacencies.measure_pairs_parallel) as parallel:
+            measured = calculate_adjacencies.calculate_border_lengths_pairwise(
+                self.province_coords, self.tolerance, workers=2, bboxes=self.bboxes)
+
+        parallel.assert_called_once()
+        self.assertEqual(measured, serial)
+
+        # Every slice borders the next one around the disc
+        count = len(self.province_coords)
+        for k in range(count):
+            pair = tuple(sorted((k, (k + 1) % count)))
+            self.assertGreater(measured[pair], self.tolerance)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the binary boundary sidecar written by data/update_combined_europe.py.
+"""
+
+import struct
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'data'))
+import update_combined_europe
+
+def read_boundary_sidecar(sidecar_file: Path):
+    """Decode a sidecar into its header and {province_id: [(x, y), ...]} in game units."""
+    data = sidecar_file.read_bytes()
+    header = update_combined_europe.BOUNDARY_SIDECAR_HEADER.unpack_from(data, 0)
+    count = header[2]
+
+    boundaries = {}
+    for index in range(count):
+        entry_offset = (update_combined_europe.BOUNDARY_SIDECAR_HEADER.size
+                        + update_combined_europe.BOUNDARY_SIDECAR_ENTRY.size * index)
+        province_id, offset, length = update_combined_europe.BOUNDARY_SIDECAR_ENTRY.unpack_from(
+            data, entry_offset)
+        values = struct.unpack_from(f'<{2 * length}i', data, offset)
+        boundaries[province_id] = [
+            (values[k] / update_combined_europe.CENTI_UNITS_PER_UNIT,
+             values[k + 1] / update_combined_europe.CENTI_UNITS_PER_UNIT)
+            for k in range(0, len(values), 2)
+        ]
+
+    return header, boundaries
+
+class BoundarySidecarTest(unittest.TestCase):
+    def setUp(self):
+        self.boundaries = {
+            100: [{"x": -12.5, "y": 3.25}, {"x": 40.0, "y": -7.75}, {"x": 0.01, "y": 499.99}],
+            101: [],
+            102: [{"x": -500.0, "y": -500.0}, {"x": 500.0, "y": 500.0}],
+        }
+        self.provinces = [
+            {"id": province_id, "name": f"p{province_id}", "boundary": list(boundary), "features": []}
+            for province_id, boundary in self.boundaries.items()
+        ]
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            sidecar_file = Path(tmpdir) / update_combined_europe.BOUNDARY_SIDECAR_FILE
+            update_combined_europe.write_boundary_sidecar(sidecar_file, self.provinces)
+            header, decoded = read_boundary_sidecar(sidecar_file)
+            size = sidecar_file.stat().st_size
+
+        self.assertEqual(header, (update_combined_europe.BOUNDARY_SIDECAR_MAGIC,
+                                  update_combined_europe.BOUNDARY_SIDECAR_VERSION,
+                                  len(self.boundaries)))
+        self.assertEqual(decoded, {
+            province_id: [(point["x"], point["y"]) for point in boundary]
+            for province_id, boundary in self.boundaries.items()
+        })
+
+        # The table is followed directly by the points, which fill the rest of the file
+        points = sum(len(boundary) for boundary in self.boundaries.values())
+        self.assertEqual(size, update_combined_europe.BOUNDARY_SIDECAR_HEADER.size
+                         + update_combined_europe.BOUNDARY_SIDECAR_ENTRY.size * len(self.boundaries)
+                         + 8 * points)
+
+    def test_boundary_replaced_by_reference(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            sidecar_file = Path(tmpdir) / update_combined_europe.BOUNDARY_SIDECAR_FILE
+            update_combined_europe.write_boundary_sidecar(sidecar_file, self.provinces)
+            data = sidecar_file.read_bytes()
+
+        for province in self.provinces:
+            self.assertEqual(list(province), ["id", "name", "boundary_ref", "features"])
+            ref = province["boundary_ref"]
+            self.assertEqual(ref["length"], len(self.boundaries[province["id"]]))
+
+            # Each reference points at the same points as the table entry
+            values = struct.unpack_from(f'<{2 * ref["length"]}i', data, ref["offset"])
+            self.assertEqual(
+                [(values[k], values[k + 1]) for k in range(0, len(values), 2)],
+                [(round(point["x"] * update_combined_europe.CENTI_UNITS_PER_UNIT),
+                  round(point["y"] * update_combined_europe.CENTI_UNITS_PER_UNIT))
+                 for point in self.boundaries[province["id"]]])
+
+if __name__ == '__main__':
+    unittest.main()
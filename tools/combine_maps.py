@@ -3,12 +3,20 @@
 Combine multiple country maps into a single combined Europe map
 """
 
-import json
+import argparse
 import sys
 import glob
+from pathlib import Path
 
-def combine_maps(map_files, output_file):
-    """Combine multiple map JSON files into one"""
+# JSON is read and written with orjson when it is installed
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'data'))
+from generate_europe_maps import read_json, write_json
+
+def combine_maps(map_files, output_file, compact=False):
+    """Combine multiple map JSON files into one
+
+    With compact=True the combined map is written without indentation
+    """
 
     all_provinces = []
     province_id = 100  # Start from 100
@@ -17,8 +25,7 @@ def combine_maps(map_files, output_file):
 
     for map_file in map_files:
         print(f"Loading {map_file}...")
-        with open(map_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = read_json(map_file)
 
         map_region = data.get('map_region', {})
         provinces = map_region.get('provinces', [])
@@ -28,12 +35,15 @@ def combine_maps(map_files, output_file):
             province['id'] = province_id
             province_id += 1
 
-            # Update bounds
-            for point in province['boundary']:
-                min_x = min(min_x, point['x'])
-                max_x = max(max_x, point['x'])
-                min_y = min(min_y, point['y'])
-                max_y = max(max_y, point['y'])
+            # Update bounds with one min/max per axis for the whole boundary
+            boundary = province['boundary']
+            if boundary:
+                xs = [point['x'] for point in boundary]
+                ys = [point['y'] for point in boundary]
+                min_x = min(min_x, min(xs))
+                max_x = max(max_x, max(xs))
+                min_y = min(min_y, min(ys))
+                max_y = max(max_y, max(ys))
 
             all_provinces.append(province)
 
@@ -59,8 +69,7 @@ def combine_maps(map_files, output_file):
         }
     }
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(combined_map, f, indent=2, ensure_ascii=False)
+    write_json(Path(output_file), combined_map, compact)
 
     print(f"\n✓ Combined {len(all_provinces)} total provinces")
     print(f"✓ Output written to {output_file}")
@@ -69,19 +78,22 @@ def combine_maps(map_files, output_file):
     return combined_map
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: combine_maps.py <output_file> <map_file1> <map_file2> ...")
-        print("  or: combine_maps.py <output_file> (will use all map_*_real.json files)")
-        sys.exit(1)
-
-    output_file = sys.argv[1]
-
-    if len(sys.argv) > 2:
-        map_files = sys.argv[2:]
+    parser = argparse.ArgumentParser(description="Combine multiple country maps into a single combined Europe map")
+    parser.add_argument("output_file", help="Combined map JSON file to write")
+    parser.add_argument("map_files", nargs="*", help="Map files to combine (default: all data/maps/map_*_real.json files)")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write the combined map without indentation (smaller, not diff-friendly)",
+    )
+    args = parser.parse_args()
+
+    if args.map_files:
+        map_files = args.map_files
     else:
         # Find all map_*_real.json files
         map_files = glob.glob('data/maps/map_*_real.json')
         map_files.sort()
 
     print(f"Combining {len(map_files)} map files...\n")
-    combine_maps(map_files, output_file)
+    combine_maps(map_files, args.output_file, args.compact)
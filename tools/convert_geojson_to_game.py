@@ -4,8 +4,14 @@ Convert real GeoJSON (lat/lon) to game coordinate format
 Based on the coordinate conversion in include/map/loaders/GeoJSONLoader.h
 """
 
-import json
+import argparse
 import sys
+from pathlib import Path
+
+# JSON is read and written with orjson when it is installed
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'data'))
+from generate_europe_maps import read_json, write_json
+from generate_europe_maps import simplify_ring as rdp_simplify_ring
 
 # Coordinate conversion settings from GeoJSONLoader.h
 EUROPE_MIN_LAT = 35.0
@@ -14,78 +20,146 @@ EUROPE_MIN_LON = -15.0
 EUROPE_MAX_LON = 45.0
 GAME_WORLD_SIZE = 1000.0  # -500 to +500
 
-def lat_lon_to_game(latitude, longitude):
-    """Convert lat/lon to game coordinates"""
-    # Normalize to 0-1 range
-    lat_norm = (latitude - EUROPE_MIN_LAT) / (EUROPE_MAX_LAT - EUROPE_MIN_LAT)
-    lon_norm = (longitude - EUROPE_MIN_LON) / (EUROPE_MAX_LON - EUROPE_MIN_LON)
-
-    # Convert to game coordinates (-500 to +500)
-    game_x = (lon_norm * GAME_WORLD_SIZE) - (GAME_WORLD_SIZE / 2)
-    game_y = (GAME_WORLD_SIZE / 2) - (lat_norm * GAME_WORLD_SIZE)  # Flip Y axis
-
-    return {"x": round(game_x, 2), "y": round(game_y, 2)}
+def outer_ring(geometry):
+    """Outer ring of a Polygon, or of the MultiPolygon part with the most points
+
+    Returns an empty list for missing geometry and other geometry types
+    """
+    if not geometry:
+        return []
+
+    if geometry['type'] == 'Polygon':
+        return geometry['coordinates'][0]
+    if geometry['type'] == 'MultiPolygon':
+        # Use the largest polygon, picked on the raw positions before conversion
+        return max(geometry['coordinates'], key=lambda p: len(p[0]))[0]
+
+    return []
+
+def ring_to_game(coords):
+    """Convert a ring of [lon, lat] positions to game x and y lists in one pass
+
+    Each position is normalized to 0-1 within the Europe bounds and scaled to
+    -500 to +500, with the Y axis flipped; values are rounded to 2 decimals
+    """
+    min_lat = EUROPE_MIN_LAT
+    min_lon = EUROPE_MIN_LON
+    lat_range = EUROPE_MAX_LAT - EUROPE_MIN_LAT
+    lon_range = EUROPE_MAX_LON - EUROPE_MIN_LON
+    size = GAME_WORLD_SIZE
+    half_size = GAME_WORLD_SIZE / 2
+
+    xs = [round(((lon - min_lon) / lon_range * size) - half_size, 2) for lon, _ in coords]
+    ys = [round(half_size - ((lat - min_lat) / lat_range * size), 2) for _, lat in coords]
+    return xs, ys
+
+def simplify_ring(xs, ys, max_points=100):
+    """Simplify a ring given as x and y lists to reduce points (basic decimation)"""
+    if len(xs) <= max_points:
+        return xs, ys
+
+    step = len(xs) // max_points
+    kept_xs = xs[::step]
+    kept_ys = ys[::step]
+    # Always keep first and last point
+    if kept_xs[-1] != xs[-1] or kept_ys[-1] != ys[-1]:
+        kept_xs.append(xs[-1])
+        kept_ys.append(ys[-1])
+
+    return kept_xs, kept_ys
+
+def douglas_peucker_ring(xs, ys, tolerance):
+    """Simplify a ring with Douglas-Peucker, dropping vertices within tolerance
+
+    Runs shapely.simplify (GEOS) when shapely 2 is installed, otherwise the
+    pure-Python simplify_ring from data/generate_europe_maps.py. Rings that
+    would keep fewer than 4 vertices are returned unchanged
+    """
+    try:
+        import shapely
+    except ImportError:
+        shapely = None
+
+    if shapely is not None and int(shapely.__version__.split('.')[0]) >= 2:
+        line = shapely.linestrings(list(zip(xs, ys)))
+        coords = shapely.get_coordinates(shapely.simplify(line, tolerance, preserve_topology=False))
+        if len(coords) < 4:
+            return xs, ys
+        return coords[:, 0].tolist(), coords[:, 1].tolist()
+
+    return rdp_simplify_ring(xs, ys, tolerance)
+
+def calculate_center(xs, ys):
+    """Calculate center point of a ring given as x and y lists"""
+    if not xs:
+        return {"x": 0, "y": 0}
 
-def simplify_polygon(coordinates, max_points=100):
-    """Simplify polygon to reduce points (basic decimation)"""
-    if len(coordinates) <= max_points:
-        return coordinates
+    count = len(xs)
 
-    step = len(coordinates) // max_points
-    simplified = [coordinates[i] for i in range(0, len(coordinates), step)]
-    # Always keep first and last point
-    if simplified[-1] != coordinates[-1]:
-        simplified.append(coordinates[-1])
+    return {
+        "x": round(sum(xs) / count, 2),
+        "y": round(sum(ys) / count, 2)
+    }
 
-    return simplified
+def calculate_bounds(rings):
+    """Calculate overall bounds of all province rings, as (xs, ys) pairs
 
-def calculate_center(boundary):
-    """Calculate center point of polygon"""
-    if not boundary:
-        return {"x": 0, "y": 0}
+    Each ring is reduced on its own, so no list of every coordinate
+    on the map is built
+    """
+    min_x = min_y = float('inf')
+    max_x = max_y = float('-inf')
+    for xs, ys in rings:
+        if not xs:
+            continue
 
-    sum_x = sum(p["x"] for p in boundary)
-    sum_y = sum(p["y"] for p in boundary)
-    count = len(boundary)
+        min_x = min(min_x, min(xs))
+        max_x = max(max_x, max(xs))
+        min_y = min(min_y, min(ys))
+        max_y = max(max_y, max(ys))
 
     return {
-        "x": round(sum_x / count, 2),
-        "y": round(sum_y / count, 2)
+        "min_x": round(min_x, 2),
+        "max_x": round(max_x, 2),
+        "min_y": round(min_y, 2),
+        "max_y": round(max_y, 2)
     }
 
-def convert_geojson_to_game(geojson_path, output_path, region_name="france", simplify=True):
-    """Convert GeoJSON file to game format"""
+def convert_geojson_to_game(geojson_path, output_path, region_name="france", simplify=True,
+                            simplify_tolerance=None):
+    """Convert GeoJSON file to game format
 
-    with open(geojson_path, 'r', encoding='utf-8') as f:
-        geojson = json.load(f)
+    Rings over 50 points are decimated to 50 by default; with a
+    simplify_tolerance (game units) every ring is simplified with
+    Douglas-Peucker instead, which keeps the shape at any point count
+    """
+
+    geojson = read_json(geojson_path)
 
     provinces = []
+    rings = []
     province_id = 100
 
     for feature in geojson['features']:
         properties = feature.get('properties', {})
-        geometry = feature.get('geometry', {})
 
         # Extract coordinates (handle Polygon and MultiPolygon)
-        coords = []
-        if geometry['type'] == 'Polygon':
-            coords = geometry['coordinates'][0]  # Outer ring
-        elif geometry['type'] == 'MultiPolygon':
-            # Use the largest polygon
-            coords = max(geometry['coordinates'], key=lambda p: len(p[0]))[0]
-
+        coords = outer_ring(feature.get('geometry'))
         if not coords:
             continue
 
-        # Convert lat/lon to game coordinates
-        boundary = [lat_lon_to_game(lat, lon) for lon, lat in coords]
+        # Convert lat/lon to game coordinates; the ring stays as x and y
+        # lists until the boundary points are written into the province
+        xs, ys = ring_to_game(coords)
 
         # Simplify polygon if needed
-        if simplify and len(boundary) > 50:
-            boundary = simplify_polygon(boundary, max_points=50)
+        if simplify and simplify_tolerance is not None:
+            xs, ys = douglas_peucker_ring(xs, ys, simplify_tolerance)
+        elif simplify and len(xs) > 50:
+            xs, ys = simplify_ring(xs, ys, max_points=50)
 
         # Calculate center
-        center = calculate_center(boundary)
+        center = calculate_center(xs, ys)
 
         # Create province entry
         province = {
@@ -98,7 +172,7 @@ def convert_geojson_to_game(geojson_path, output_path, region_name="france", sim
             "base_production": 5,
             "base_manpower": 5,
             "development": 15,
-            "boundary": boundary,
+            "boundary": [{"x": x, "y": y} for x, y in zip(xs, ys)],
             "features": [],
             "trade_goods": "grain",
             "culture": "french",
@@ -107,18 +181,11 @@ def convert_geojson_to_game(geojson_path, output_path, region_name="france", sim
         }
 
         provinces.append(province)
+        rings.append((xs, ys))
         province_id += 1
 
     # Calculate overall bounds
-    all_x = [p['x'] for prov in provinces for p in prov['boundary']]
-    all_y = [p['y'] for prov in provinces for p in prov['boundary']]
-
-    bounds = {
-        "min_x": round(min(all_x), 2),
-        "max_x": round(max(all_x), 2),
-        "min_y": round(min(all_y), 2),
-        "max_y": round(max(all_y), 2)
-    }
+    bounds = calculate_bounds(rings)
 
     # Create game format output
     output = {
@@ -135,8 +202,7 @@ def convert_geojson_to_game(geojson_path, output_path, region_name="france", sim
         }
     }
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+    write_json(Path(output_path), output)
 
     print(f"✓ Converted {len(provinces)} provinces from {geojson_path}")
     print(f"✓ Output written to {output_path}")
@@ -145,12 +211,18 @@ def convert_geojson_to_game(geojson_path, output_path, region_name="france", sim
     return output
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: convert_geojson_to_game.py <input.geojson> <output.json> [region_name]")
-        sys.exit(1)
-
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
-    region_name = sys.argv[3] if len(sys.argv) > 3 else "france"
-
-    convert_geojson_to_game(input_file, output_file, region_name)
+    parser = argparse.ArgumentParser(description="Convert real GeoJSON (lat/lon) to game coordinate format")
+    parser.add_argument("input_file", help="GeoJSON file to convert")
+    parser.add_argument("output_file", help="Game map JSON file to write")
+    parser.add_argument("region_name", nargs="?", default="france", help="Map region id (default: france)")
+    parser.add_argument(
+        "--simplify-tolerance",
+        type=float,
+        default=None,
+        help="Simplify rings with Douglas-Peucker at this tolerance in game units "
+             "instead of decimating them to 50 points (uses shapely 2 if installed)",
+    )
+    args = parser.parse_args()
+
+    convert_geojson_to_game(args.input_file, args.output_file, args.region_name,
+                            simplify_tolerance=args.simplify_tolerance)
@@ -3,8 +3,12 @@
 Extract specific countries from NUTS level 1 data and convert to game format
 """
 
-import json
 import sys
+from pathlib import Path
+
+# JSON is read and written with orjson when it is installed
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'data'))
+from generate_europe_maps import read_json, write_json
 
 # Country codes for the countries we want to extract
 # Based on NUTS naming: ES = Spain, PT = Portugal, UK/UKC/UKD/etc = UK,
@@ -24,11 +28,14 @@ COUNTRY_PREFIXES = {
     'FR': 'france',
 }
 
+# Every prefix is a two-letter country code, so a NUTS ID is matched
+# by looking up its first two characters
+PREFIX_LENGTH = 2
+
 def extract_countries_from_nuts(nuts_file, output_dir):
     """Extract individual countries from NUTS level 1 data"""
 
-    with open(nuts_file, 'r', encoding='utf-8') as f:
-        nuts_data = json.load(f)
+    nuts_data = read_json(nuts_file)
 
     # Group features by country
     countries = {}
@@ -39,10 +46,9 @@ def extract_countries_from_nuts(nuts_file, output_dir):
         nuts_id = feature['properties']['id']
 
         # Determine country from NUTS ID
-        for code in COUNTRY_PREFIXES.keys():
-            if nuts_id.startswith(code):
-                countries[code].append(feature)
-                break
+        code = nuts_id[:PREFIX_LENGTH]
+        if code in countries:
+            countries[code].append(feature)
 
     # Save each country to a separate GeoJSON file
     results = {}
@@ -58,8 +64,7 @@ def extract_countries_from_nuts(nuts_file, output_dir):
             "features": features
         }
 
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(geojson, f, indent=2, ensure_ascii=False)
+        write_json(Path(output_file), geojson)
 
         results[country_name] = {
             'file': output_file,
@@ -6,11 +6,13 @@ from __future__ import annotations
 import argparse
 import datetime as dt
 import json
+import math
 import os
 import shlex
 import statistics
 import subprocess
 import sys
+from operator import itemgetter
 from pathlib import Path
 from typing import Any, Dict, List
 
@@ -39,6 +41,23 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+# Dashboard table columns, pulled from each per-run entry in one call
+ROW_FIELDS = itemgetter(
+    "timestamp",
+    "average_tick_ms",
+    "p95_tick_ms",
+    "max_tick_ms",
+    "resident_memory_kb",
+    "peak_active_tasks",
+    "peak_queue_depth",
+)
+HTML_ROW = (
+    "<tr><td>%d</td><td>%s</td><td>%.2f</td><td>%.2f</td><td>%.2f</td><td>%.1f</td>"
+    "<td>%s</td><td>%s</td></tr>"
+)
+MD_ROW = "| %d | %s | %.2f | %.2f | %.2f | %.1f | %s | %s |\n"
+
+
 def ensure_executable(path: Path) -> None:
     if not path.exists():
         raise FileNotFoundError(f"Binary '{path}' does not exist")
@@ -46,53 +65,73 @@ def ensure_executable(path: Path) -> None:
         raise PermissionError(f"Binary '{path}' is not executable")
 
 
-def run_stress_once(binary: Path, run_index: int, run_dir: Path, extra_args: str) -> Dict[str, Any]:
+# How much of each log is echoed when a run fails
+LOG_TAIL_BYTES = 64 * 1024
+
+
+def read_log_tail(path: Path, limit: int = LOG_TAIL_BYTES) -> str:
+    with path.open("rb") as handle:
+        handle.seek(max(0, path.stat().st_size - limit))
+        return handle.read().decode("utf-8", errors="replace")
+
+
+def run_stress_once(binary: Path, run_index: int, run_dir: Path, extra_args: str) -> Path:
     run_output_dir = run_dir / f"run_{run_index:02d}"
     run_output_dir.mkdir(parents=True, exist_ok=True)
     json_path = run_output_dir / "stress_metrics.json"
+    stdout_path = run_output_dir / "stdout.log"
+    stderr_path = run_output_dir / "stderr.log"
 
     base_command = [str(binary), "--stress-test", "--stress-json", str(json_path)]
     if extra_args:
         base_command.extend(shlex.split(extra_args))
 
     print(f"[stress-automation] Running: {' '.join(base_command)}")
-    completed = subprocess.run(base_command, capture_output=True, text=True)
-    if completed.returncode != 0:
-        sys.stderr.write(completed.stdout)
-        sys.stderr.write(completed.stderr)
-        raise RuntimeError(f"Stress harness exited with code {completed.returncode}")
+    # The harness writes stdout/stderr straight into the run's log files, so
+    # long runs are never buffered in memory. close_fds=False lets CPython
+    # start it with posix_spawn (descriptors Python opens are non-inheritable
+    # anyway); closing fds or a new session would force fork/exec
+    with stdout_path.open("wb") as stdout, stderr_path.open("wb") as stderr:
+        returncode = subprocess.call(base_command, stdout=stdout, stderr=stderr, close_fds=False)
+    if returncode != 0:
+        sys.stderr.write(read_log_tail(stdout_path))
+        sys.stderr.write(read_log_tail(stderr_path))
+        raise RuntimeError(f"Stress harness exited with code {returncode}")
 
     if not json_path.exists():
         raise RuntimeError(f"Stress harness did not produce metrics file: {json_path}")
 
-    with json_path.open("r", encoding="utf-8") as handle:
-        data = json.load(handle)
+    return json_path
 
-    # Write captured stdout/stderr for traceability
-    (run_output_dir / "stdout.log").write_text(completed.stdout, encoding="utf-8")
-    (run_output_dir / "stderr.log").write_text(completed.stderr, encoding="utf-8")
 
-    return data
+def load_run_metrics(json_path: Path) -> Dict[str, Any]:
+    try:
+        import orjson
+    except ImportError:
+        with json_path.open("r", encoding="utf-8") as handle:
+            return json.load(handle)
 
+    return orjson.loads(json_path.read_bytes())
 
-def aggregate_runs(results: List[Dict[str, Any]]) -> Dict[str, Any]:
-    tick_avgs = [entry["metrics"]["average_tick_ms"] for entry in results]
-    p95s = [entry["metrics"].get("p95_tick_ms", 0.0) for entry in results]
-    mem_usage = [entry["metrics"].get("resident_memory_kb", 0.0) for entry in results]
 
-    aggregate: Dict[str, Any] = {
-        "mean_average_tick_ms": statistics.mean(tick_avgs) if tick_avgs else 0.0,
-        "median_average_tick_ms": statistics.median(tick_avgs) if tick_avgs else 0.0,
-        "mean_p95_tick_ms": statistics.mean(p95s) if p95s else 0.0,
-        "peak_p95_tick_ms": max(p95s) if p95s else 0.0,
-        "peak_memory_kb": max(mem_usage) if mem_usage else 0.0,
-        "mean_memory_kb": statistics.mean(mem_usage) if mem_usage else 0.0,
-        "per_run": [],
-    }
+def mean(values: List[float]) -> float:
+    # statistics.mean sums through exact Fractions, which is far more work than
+    # a handful of runs needs; fsum keeps the float sum correctly rounded
+    return math.fsum(values) / len(values) if values else 0.0
 
+
+def aggregate_runs(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # One walk over the runs collects the samples and the per-run rows
+    tick_avgs: List[float] = []
+    p95s: List[float] = []
+    mem_usage: List[float] = []
+    per_run: List[Dict[str, Any]] = []
     for entry in results:
         metrics = entry["metrics"]
-        aggregate["per_run"].append(
+        tick_avgs.append(metrics["average_tick_ms"])
+        p95s.append(metrics.get("p95_tick_ms", 0.0))
+        mem_usage.append(metrics.get("resident_memory_kb", 0.0))
+        per_run.append(
             {
                 "timestamp": metrics.get("timestamp_utc"),
                 "average_tick_ms": metrics.get("average_tick_ms"),
@@ -104,24 +143,37 @@ def aggregate_runs(results: List[Dict[str, Any]]) -> Dict[str, Any]:
             }
         )
 
+    aggregate: Dict[str, Any] = {
+        "mean_average_tick_ms": mean(tick_avgs),
+        # statistics.median sorts with the C timsort, which beats a Python-level
+        # quickselect at any realistic --runs count
+        "median_average_tick_ms": statistics.median(tick_avgs) if tick_avgs else 0.0,
+        "mean_p95_tick_ms": mean(p95s),
+        "peak_p95_tick_ms": max(p95s) if p95s else 0.0,
+        "peak_memory_kb": max(mem_usage) if mem_usage else 0.0,
+        "mean_memory_kb": mean(mem_usage),
+        "per_run": per_run,
+    }
+
     return aggregate
 
 
-def render_dashboard(aggregate: Dict[str, Any], results: List[Dict[str, Any]], output_dir: Path, label: str) -> None:
+def render_dashboard(aggregate: Dict[str, Any], run_files: List[Path], output_dir: Path, label: str) -> None:
     generated_at = dt.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
     html_path = output_dir / "dashboard.html"
     md_path = output_dir / "dashboard.md"
 
-    rows = []
-    for idx, entry in enumerate(aggregate["per_run"], start=1):
-        rows.append(
-            f"<tr><td>{idx}</td><td>{entry['timestamp']}</td><td>{entry['average_tick_ms']:.2f}</td>"
-            f"<td>{entry['p95_tick_ms']:.2f}</td><td>{entry['max_tick_ms']:.2f}</td>"
-            f"<td>{entry['resident_memory_kb'] / 1024.0:.1f}</td>"
-            f"<td>{entry['peak_active_tasks']}</td><td>{entry['peak_queue_depth']}</td></tr>"
+    table = [
+        (idx, timestamp, average, p95, peak, memory_kb / 1024.0, active, queue)
+        for idx, (timestamp, average, p95, peak, memory_kb, active, queue) in enumerate(
+            map(ROW_FIELDS, aggregate["per_run"]), start=1
         )
+    ]
+    rows = [HTML_ROW % row for row in table]
 
-    html = f"""<!DOCTYPE html>
+    # The page is streamed around the rows instead of being formatted into
+    # one string that embeds them
+    html_head = f"""<!DOCTYPE html>
 <html lang=\"en\">
 <head>
 <meta charset=\"utf-8\" />
@@ -152,7 +204,8 @@ th {{ background-color: #f5f5f5; }}
       <tr><th>Run</th><th>Timestamp (UTC)</th><th>Avg Tick (ms)</th><th>P95 Tick (ms)</th><th>Max Tick (ms)</th><th>Resident MiB</th><th>Peak Active</th><th>Peak Queue</th></tr>
     </thead>
     <tbody>
-      {''.join(rows)}
+      """
+    html_tail = """
     </tbody>
   </table>
 </section>
@@ -160,36 +213,40 @@ th {{ background-color: #f5f5f5; }}
 </html>
 """
 
-    html_path.write_text(html, encoding="utf-8")
-
-    with md_path.open("w", encoding="utf-8") as handle:
-        handle.write(f"# Stress Automation Report ({label})\n\n")
-        handle.write(f"Generated at **{generated_at}**\n\n")
-        handle.write(
-            "| Run | Timestamp (UTC) | Avg Tick (ms) | P95 Tick (ms) | Max Tick (ms) | Resident MiB | Peak Active | Peak Queue |\n"
-        )
-        handle.write("| --- | --- | --- | --- | --- | --- | --- | --- |\n")
-        for idx, entry in enumerate(aggregate["per_run"], start=1):
-            handle.write(
-                f"| {idx} | {entry['timestamp']} | {entry['average_tick_ms']:.2f} | {entry['p95_tick_ms']:.2f}"
-                f" | {entry['max_tick_ms']:.2f} | {entry['resident_memory_kb'] / 1024.0:.1f}"
-                f" | {entry['peak_active_tasks']} | {entry['peak_queue_depth']} |\n"
-            )
-        handle.write("\n")
-        handle.write(
-            f"**Mean avg tick:** {aggregate['mean_average_tick_ms']:.2f} ms · "
-            f"**Median avg tick:** {aggregate['median_average_tick_ms']:.2f} ms · "
-            f"**Mean p95:** {aggregate['mean_p95_tick_ms']:.2f} ms (peak {aggregate['peak_p95_tick_ms']:.2f} ms) · "
-            f"**Mean resident mem:** {aggregate['mean_memory_kb'] / 1024.0:.1f} MiB (peak {aggregate['peak_memory_kb'] / 1024.0:.1f} MiB)\n"
-        )
+    with html_path.open("w", encoding="utf-8") as handle:
+        handle.write(html_head)
+        handle.writelines(rows)
+        handle.write(html_tail)
+
+    md_rows = [MD_ROW % row for row in table]
+
+    markdown = (
+        f"# Stress Automation Report ({label})\n\n"
+        f"Generated at **{generated_at}**\n\n"
+        "| Run | Timestamp (UTC) | Avg Tick (ms) | P95 Tick (ms) | Max Tick (ms) | Resident MiB | Peak Active | Peak Queue |\n"
+        "| --- | --- | --- | --- | --- | --- | --- | --- |\n"
+        f"{''.join(md_rows)}"
+        "\n"
+        f"**Mean avg tick:** {aggregate['mean_average_tick_ms']:.2f} ms · "
+        f"**Median avg tick:** {aggregate['median_average_tick_ms']:.2f} ms · "
+        f"**Mean p95:** {aggregate['mean_p95_tick_ms']:.2f} ms (peak {aggregate['peak_p95_tick_ms']:.2f} ms) · "
+        f"**Mean resident mem:** {aggregate['mean_memory_kb'] / 1024.0:.1f} MiB (peak {aggregate['peak_memory_kb'] / 1024.0:.1f} MiB)\n"
+    )
+    md_path.write_text(markdown, encoding="utf-8")
 
     summary_json = {
         "generated_at": generated_at,
         "label": label,
         "aggregate": aggregate,
-        "runs": results,
+        # The raw metrics stay in each run's directory; the summary only points at them
+        "run_files": [run_file.relative_to(output_dir).as_posix() for run_file in run_files],
     }
-    (output_dir / "summary.json").write_text(json.dumps(summary_json, indent=2), encoding="utf-8")
+    try:
+        import orjson
+    except ImportError:
+        (output_dir / "summary.json").write_text(json.dumps(summary_json, indent=2), encoding="utf-8")
+    else:
+        (output_dir / "summary.json").write_bytes(orjson.dumps(summary_json, option=orjson.OPT_INDENT_2))
 
 
 def main() -> None:
@@ -201,13 +258,16 @@ def main() -> None:
     output_dir = Path(args.output).resolve() / timestamp
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    run_results: List[Dict[str, Any]] = []
-    for run_index in range(1, args.runs + 1):
-        result = run_stress_once(binary, run_index, output_dir, args.stress_args)
-        run_results.append(result)
+    # Runs stay strictly serial so their timings do not interfere, and their
+    # metrics are only parsed once the last run has finished
+    run_files: List[Path] = [
+        run_stress_once(binary, run_index, output_dir, args.stress_args)
+        for run_index in range(1, args.runs + 1)
+    ]
+    run_results: List[Dict[str, Any]] = [load_run_metrics(run_file) for run_file in run_files]
 
     aggregate = aggregate_runs(run_results)
-    render_dashboard(aggregate, run_results, output_dir, args.label)
+    render_dashboard(aggregate, run_files, output_dir, args.label)
     print(f"Dashboard written to {output_dir}")
 
 